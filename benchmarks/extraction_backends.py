@@ -0,0 +1,117 @@
+"""Compare the thread and process extraction backends.
+
+Runs the same batch of yt-dlp extractions through each backend and reports
+throughput, extraction latency, event loop lag and the jitter of a 20 ms
+ticker thread standing in for discord.py's voice send loop.
+
+Needs network access to YouTube:
+
+    python -m benchmarks.extraction_backends --workers 4 "lofi hip hop" "never gonna give you up"
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+
+os.environ.setdefault('DISCORD_BOT_TOKEN', 'benchmark')
+
+from cogs.music import YDL_OPTIONS  # noqa: E402
+from services.extractor import ExtractionService  # noqa: E402
+
+DEFAULT_QUERIES = [
+    'never gonna give you up',
+    'bohemian rhapsody',
+    'lofi hip hop radio',
+    'daft punk around the world',
+    'beethoven moonlight sonata',
+    'the beatles let it be',
+    'nirvana smells like teen spirit',
+    'darude sandstorm',
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] if values else 0.0
+
+
+class Ticker(threading.Thread):
+    """Sleeps in 20 ms steps like the voice player and records how late it wakes up."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.late = []
+        self.running = True
+
+    def run(self):
+        next_time = time.perf_counter()
+        while self.running:
+            next_time += 0.02
+            time.sleep(max(0, next_time - time.perf_counter()))
+            self.late.append(max(0.0, time.perf_counter() - next_time))
+
+
+async def loop_lag(samples, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        samples.append(max(0.0, time.perf_counter() - start - 0.01))
+
+
+async def run_backend(backend, queries, workers):
+    service = ExtractionService(YDL_OPTIONS, workers=workers, backend=backend)
+    service.start()
+
+    # Warm up so process start-up and YoutubeDL initialisation are not measured
+    await asyncio.gather(
+        *(service.extract(q, guild_id=i) for i, q in enumerate(queries[:workers])), return_exceptions=True
+    )
+
+    lag, stop = [], asyncio.Event()
+    lag_task = asyncio.create_task(loop_lag(lag, stop))
+    ticker = Ticker()
+    ticker.start()
+
+    latencies = []
+
+    async def timed(query, guild_id):
+        start = time.perf_counter()
+        try:
+            await service.extract(query, guild_id)
+        except Exception as e:
+            print(f'  {query!r} failed: {e}')
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(q, i) for i, q in enumerate(queries)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await lag_task
+    ticker.running = False
+    ticker.join()
+    await service.close()
+
+    print(f'{backend} backend ({workers} workers, {len(queries)} extractions)')
+    print(f'  wall time:        {elapsed:.2f} s ({len(queries) / elapsed:.2f} extractions/s)')
+    print(f'  latency:          median {statistics.median(latencies):.2f} s, p95 {percentile(latencies, 0.95):.2f} s')
+    print(f'  event loop lag:   p99 {percentile(lag, 0.99) * 1000:.1f} ms, max {max(lag, default=0) * 1000:.1f} ms')
+    print(f'  20 ms tick late:  p99 {percentile(ticker.late, 0.99) * 1000:.1f} ms, '
+          f'max {max(ticker.late, default=0) * 1000:.1f} ms')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('queries', nargs='*', default=DEFAULT_QUERIES)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--backends', default='thread,process')
+    args = parser.parse_args()
+
+    for backend in args.backends.split(','):
+        await run_backend(backend, args.queries, args.workers)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
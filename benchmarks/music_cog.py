@@ -0,0 +1,546 @@
+"""Load-test the Music cog offline, across many simulated guilds.
+
+yt-dlp, the voice client and Discord's HTTP API are replaced by fakes, so the
+run needs neither Discord nor YouTube:
+
+- FakeYoutubeDL answers after a configurable (jittered) delay and points every
+  track at a local audio fixture.
+- FakeVoiceClient sends frames every 20 ms from one thread per guild, like
+  discord.py's AudioPlayer, without touching the network.
+- Channels, messages and interactions just sleep for ``--http-delay``.
+
+With FFmpeg installed, the fixture is served over local HTTP and played
+through the real FFmpeg pipelines. Without it (or with ``--fake-ffmpeg``), the
+pipeline is replaced by a source replaying the fixture's Opus packets.
+
+Each guild joins, plays a track, queues two more, opens the queue and presses
+the pause, resume and skip buttons, then skips again and stops. The run
+reports command-to-first-audio latency percentiles, event loop lag, CPU per
+stream and memory per guild. ``--same-track`` starts every guild on the same
+track, to measure the shared (fan-out) pipelines:
+
+    python -m benchmarks.music_cog --guilds 200 --extract-delay 0.5
+"""
+import argparse
+import asyncio
+import itertools
+import math
+import os
+import random
+import shutil
+import statistics
+import struct
+import tempfile
+import threading
+import time
+import wave
+from pathlib import Path
+
+os.environ.setdefault('DISCORD_BOT_TOKEN', 'benchmark')
+# Keep the run self-contained: no state file, no HTTP endpoint, no disk caches
+os.environ['STATE_ENABLED'] = '0'
+os.environ['METRICS_ENABLED'] = '0'
+os.environ['OPUS_CACHE_ENABLED'] = '0'
+os.environ['TRACK_CACHE_ENABLED'] = '0'
+os.environ['LOUDNESS_ENABLED'] = '0'
+
+import discord  # noqa: E402
+import yt_dlp  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+import cogs.music as music  # noqa: E402
+from services.opus_cache import iter_opus_packets  # noqa: E402
+from services.playback import PATH_OPUS_COPY, PATH_SHARED  # noqa: E402
+
+from benchmarks.extraction_backends import percentile, loop_lag  # noqa: E402
+
+# An Opus packet of 20 ms of silence
+OPUS_SILENCE = b'\xf8\xff\xfe'
+
+_ids = itertools.count(1)
+
+
+class Settings:
+    extract_delay = 0.3
+    http_delay = 0.05
+    track_seconds = 30
+    stream_url = None  # fixture URL handed out by FakeYoutubeDL
+    same_track = False  # every guild starts with the same track
+
+
+class FakeYoutubeDL:
+    """Stands in for yt_dlp.YoutubeDL: a blocking delay, then a canned result."""
+
+    def __init__(self, options=None):
+        self.options = options or {}
+
+    def extract_info(self, query, download=False):
+        time.sleep(Settings.extract_delay * random.uniform(0.5, 1.5))
+        video_id = f'{abs(hash(query)) % 10 ** 11:011d}'
+        return {
+            'id': video_id,
+            'url': f'{Settings.stream_url}?v={video_id}',
+            'title': f'Track {query}',
+            'duration': Settings.track_seconds,
+            'thumbnail': None,
+            'webpage_url': f'https://www.youtube.com/watch?v={video_id}',
+            'acodec': 'opus',
+        }
+
+    def close(self):
+        pass
+
+
+class FixtureSource(discord.AudioSource):
+    """Replays pre-read Opus packets, in place of an FFmpeg pipeline."""
+
+    def __init__(self, packets):
+        self._packets = iter(packets)
+
+    def read(self):
+        return next(self._packets, b'')
+
+    def is_opus(self):
+        return True
+
+
+class FakeMessage:
+    def __init__(self, channel, content=None, embed=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.embeds = [embed] if embed is not None else []
+        self.created_at = discord.utils.utcnow()
+
+    async def edit(self, **kwargs):
+        await asyncio.sleep(Settings.http_delay)
+        if 'embed' in kwargs:
+            self.embeds = [kwargs['embed']]
+
+
+class FakeTextChannel:
+    def __init__(self, guild):
+        self.id = next(_ids)
+        self.guild = guild
+        self.sent = 0
+
+    async def send(self, content=None, *, embed=None, view=None, delete_after=None, **kwargs):
+        await asyncio.sleep(Settings.http_delay)
+        self.sent += 1
+        return FakeMessage(self, content, embed)
+
+
+class FakeVoiceClient:
+    """Sends a source's frames every 20 ms on its own thread, like discord.py's AudioPlayer."""
+
+    def __init__(self, guild, channel, loop):
+        self.guild = guild
+        self.channel = channel
+        self.loop = loop
+        self._playback = None
+        self.audio = asyncio.Event()  # set when a newly started source sends its first frame
+        self.first_audio_at = None
+        self.frames_sent = 0
+        self.late = []
+
+    def is_connected(self):
+        return self.guild.voice_client is self
+
+    def is_playing(self):
+        return self._playback is not None and not self._playback['done'] and not self._playback['paused']
+
+    def is_paused(self):
+        return self._playback is not None and not self._playback['done'] and self._playback['paused']
+
+    def play(self, source, *, after=None):
+        playback = {'done': False, 'paused': False, 'stop': False}
+        self._playback = playback
+        threading.Thread(target=self._run, args=(playback, source, after), daemon=True).start()
+
+    def _run(self, playback, source, after):
+        error = None
+        first = True
+        next_time = time.perf_counter()
+        try:
+            while not playback['stop']:
+                if playback['paused']:
+                    time.sleep(0.02)
+                    next_time = time.perf_counter()
+                    continue
+                data = source.read()
+                if not data:
+                    break
+                if first:
+                    first = False
+                    self.loop.call_soon_threadsafe(self._on_first_frame, time.perf_counter())
+                self.frames_sent += 1
+                next_time += 0.02
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.late.append(-delay)
+        except Exception as e:
+            error = e
+        finally:
+            playback['done'] = True
+            source.cleanup()
+            if after is not None:
+                after(error)
+
+    def _on_first_frame(self, at):
+        self.first_audio_at = at
+        self.audio.set()
+
+    def pause(self):
+        if self._playback is not None:
+            self._playback['paused'] = True
+
+    def resume(self):
+        if self._playback is not None:
+            self._playback['paused'] = False
+
+    def stop(self):
+        if self._playback is not None:
+            self._playback['stop'] = True
+
+    async def move_to(self, channel):
+        self.channel = channel
+
+    async def disconnect(self, *, force=False):
+        self.stop()
+        self.guild.voice_client = None
+
+
+class FakeVoiceChannel:
+    def __init__(self, guild):
+        self.id = next(_ids)
+        self.guild = guild
+        self.name = f'voice-{guild.id}'
+        self.members = []
+
+    async def connect(self, *, timeout=60.0, **kwargs):
+        await asyncio.sleep(Settings.http_delay)
+        self.guild.voice_client = FakeVoiceClient(self.guild, self, asyncio.get_running_loop())
+        return self.guild.voice_client
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.name = f'guild-{guild_id}'
+        self.voice_client = None
+        self.text_channel = FakeTextChannel(self)
+        self.voice_channel = FakeVoiceChannel(self)
+
+    def get_channel(self, channel_id):
+        return {self.text_channel.id: self.text_channel, self.voice_channel.id: self.voice_channel}.get(channel_id)
+
+
+class FakeMember:
+    def __init__(self, guild):
+        self.id = next(_ids)
+        self.bot = False
+        self.mention = f'<@{self.id}>'
+        self.voice = type('VoiceState', (), {'channel': guild.voice_channel})()
+
+
+class FakeContext:
+    """The parts of commands.Context the cog's commands use."""
+
+    def __init__(self, guild, author):
+        self.guild = guild
+        self.channel = guild.text_channel
+        self.author = author
+        self.interaction = None
+        self.message = FakeMessage(self.channel)
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send_message(self, content=None, **kwargs):
+        await asyncio.sleep(Settings.http_delay)
+
+    async def edit_message(self, **kwargs):
+        await self.interaction.message.edit(**kwargs)
+
+    async def defer(self, **kwargs):
+        await asyncio.sleep(Settings.http_delay)
+
+
+class FakeFollowup:
+    async def send(self, content=None, **kwargs):
+        await asyncio.sleep(Settings.http_delay)
+
+
+class FakeInteraction:
+    """A button press on the now playing message."""
+
+    def __init__(self, guild, user, message):
+        self.guild = guild
+        self.channel = guild.text_channel
+        self.user = user
+        self.message = message
+        self.created_at = discord.utils.utcnow()
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup()
+
+    async def edit_original_response(self, **kwargs):
+        await self.message.edit(**kwargs)
+
+
+class FakeBot:
+    def __init__(self, guilds):
+        self.guilds = {guild.id: guild for guild in guilds}
+        self.loop = asyncio.get_running_loop()
+
+    @property
+    def voice_clients(self):
+        return [guild.voice_client for guild in self.guilds.values() if guild.voice_client is not None]
+
+    def get_guild(self, guild_id):
+        return self.guilds.get(guild_id)
+
+    def add_view(self, view):
+        pass
+
+    def is_ready(self):
+        return True
+
+
+def write_wav_fixture(path, seconds):
+    """A 48 kHz stereo sine tone for FFmpeg to decode."""
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(48000)
+        frame = bytearray()
+        for i in range(48000):
+            sample = int(8000 * math.sin(2 * math.pi * 440 * i / 48000))
+            frame += struct.pack('<hh', sample, sample)
+        for _ in range(seconds):
+            f.writeframes(frame)
+
+
+def load_packets(fixture, seconds):
+    """Opus packets of an Ogg Opus fixture, or silence when there is none."""
+    if fixture is not None and fixture.suffix in ('.opus', '.ogg'):
+        with open(fixture, 'rb') as f:
+            return list(iter_opus_packets(f))
+    return [OPUS_SILENCE] * (seconds * music.FRAMES_PER_SECOND)
+
+
+async def serve_fixture(fixture):
+    app = web.Application()
+    app.router.add_get('/track', lambda request: web.FileResponse(fixture))
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{port}/track'
+
+
+def rss_bytes():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def children_cpu_seconds():
+    """CPU time of live child processes (the FFmpeg pipelines), from /proc."""
+    total = 0
+    tick = os.sysconf('SC_CLK_TCK')
+    parent = os.getpid()
+    for stat in Path('/proc').glob('[0-9]*/stat'):
+        try:
+            fields = stat.read_text().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == parent:
+            total += (int(fields[11]) + int(fields[12])) / tick
+    return total
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def wait_for_audio(voice_client, start, timeout=60):
+    """Seconds from start until the voice client's next source sends its first frame.
+
+    Clear ``voice_client.audio`` before triggering the change, or a track that
+    started on its own earlier is reported instead.
+    """
+    await asyncio.wait_for(voice_client.audio.wait(), timeout)
+    return voice_client.first_audio_at - start
+
+
+def check_queued(player):
+    """Fail instead of timing a skip with nothing left to skip to."""
+    if not player.queue:
+        raise Exception('Tracks ended on their own before the skips, raise --track-seconds')
+
+
+async def run_guild(cog, guild, results, steady):
+    member = FakeMember(guild)
+    guild.voice_channel.members.append(member)
+    ctx = FakeContext(guild, member)
+    play = cog.play.callback
+
+    # Cold play: join, extract, spawn, first packet
+    start = time.perf_counter()
+    await play(cog, ctx, query='shared song' if Settings.same_track else f'song {guild.id} a')
+    voice_client = guild.voice_client
+    results['play'].append(await wait_for_audio(voice_client, start))
+
+    for suffix in ('b', 'c'):
+        results['enqueue'].append(await timed(play(cog, ctx, query=f'song {guild.id} {suffix}')))
+    results['queue'].append(await timed(cog.queue.callback(cog, ctx)))
+
+    # Everyone streams at once for a while
+    await steady.wait()
+
+    player = cog.get_player(guild.id)
+    for action in ('pause', 'resume'):
+        interaction = FakeInteraction(guild, member, player.now_playing_message)
+        results['control'].append(await timed(cog.handle_control(interaction, action)))
+
+    check_queued(player)
+    voice_client.audio.clear()
+    start = time.perf_counter()
+    await cog.handle_control(FakeInteraction(guild, member, player.now_playing_message), 'skip')
+    results['skip'].append(await wait_for_audio(voice_client, start))
+
+    check_queued(player)
+    voice_client.audio.clear()
+    start = time.perf_counter()
+    await cog.skip.callback(cog, ctx)
+    results['skip'].append(await wait_for_audio(voice_client, start))
+
+    await cog.stop.callback(cog, ctx)
+
+
+def report_latency(name, values):
+    if not values:
+        return
+    print(f'  {name:<18} p50 {percentile(values, 0.5) * 1000:7.1f} ms   p95 {percentile(values, 0.95) * 1000:7.1f} ms   '
+          f'p99 {percentile(values, 0.99) * 1000:7.1f} ms   max {max(values) * 1000:7.1f} ms')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', type=int, default=200)
+    parser.add_argument('--extract-delay', type=float, default=0.3, help='mean yt-dlp delay in seconds')
+    parser.add_argument('--http-delay', type=float, default=0.05, help='delay of each Discord API call in seconds')
+    parser.add_argument('--workers', type=int, default=music.EXTRACT_WORKERS)
+    parser.add_argument('--steady', type=float, default=10, help='seconds all guilds stream together')
+    parser.add_argument(
+        '--track-seconds', type=int, default=0,
+        help='track length (default: long enough to outlast queueing and --steady)'
+    )
+    parser.add_argument('--fixture', type=Path, help='local audio file to stream (default: generated)')
+    parser.add_argument('--fake-ffmpeg', action='store_true', help='replay Opus packets instead of running FFmpeg')
+    parser.add_argument('--same-track', action='store_true', help='start every guild on the same track (fan-out)')
+    args = parser.parse_args()
+
+    if not args.track_seconds:
+        # Tracks must not end on their own before the skips: cover the three
+        # extractions and messages per guild, spread over the workers, plus --steady
+        queueing = args.guilds * 3 * (args.extract_delay + 3 * args.http_delay) / args.workers
+        args.track_seconds = int(args.steady + queueing * 2) + 30
+
+    Settings.extract_delay = args.extract_delay
+    Settings.http_delay = args.http_delay
+    Settings.track_seconds = args.track_seconds
+    Settings.same_track = args.same_track
+    yt_dlp.YoutubeDL = FakeYoutubeDL
+
+    use_ffmpeg = shutil.which('ffmpeg') is not None and not args.fake_ffmpeg
+    tmpdir = tempfile.TemporaryDirectory()
+    runner = None
+    if use_ffmpeg:
+        fixture = args.fixture
+        if fixture is None:
+            fixture = Path(tmpdir.name) / 'fixture.wav'
+            write_wav_fixture(fixture, args.track_seconds)
+        runner, Settings.stream_url = await serve_fixture(fixture)
+    else:
+        packets = load_packets(args.fixture, args.track_seconds)
+        Settings.stream_url = 'http://fixture.invalid/track'
+
+        def open_fixture(url, codec=None, mode='passthrough', before_options=None, options=None, start_at=0, gain=0.0):
+            return FixtureSource(packets[int(start_at * music.FRAMES_PER_SECOND):]), PATH_OPUS_COPY
+
+        music.open_ffmpeg_source = open_fixture
+
+    guilds = [FakeGuild(guild_id) for guild_id in range(1, args.guilds + 1)]
+    bot = FakeBot(guilds)
+    cog = music.Music(bot)
+    # Threads only: worker processes would not see the patched YoutubeDL
+    cog.extractor = music.ExtractionService(music.YDL_OPTIONS, workers=args.workers, backend='thread')
+    cog.extractor.start()
+
+    results = {name: [] for name in ('play', 'enqueue', 'queue', 'control', 'skip')}
+    lag, stop = [], asyncio.Event()
+    lag_task = asyncio.create_task(loop_lag(lag, stop))
+    steady = asyncio.Event()
+
+    rss_before = rss_bytes()
+    print(f'{args.guilds} guilds, extract delay {args.extract_delay:.2f} s, http delay {args.http_delay * 1000:.0f} ms, '
+          f'{args.workers} extraction workers, {"FFmpeg" if use_ffmpeg else "fake FFmpeg"}')
+    guild_tasks = [asyncio.create_task(run_guild(cog, guild, results, steady)) for guild in guilds]
+
+    # Wait until every guild is streaming, then measure the steady state
+    while len(results['queue']) < args.guilds and not any(task.done() for task in guild_tasks):
+        await asyncio.sleep(0.1)
+    streams = len(bot.voice_clients)
+    cpu_start, children_start, wall_start = time.process_time(), children_cpu_seconds(), time.perf_counter()
+    await asyncio.sleep(args.steady)
+    cpu = time.process_time() - cpu_start
+    children = children_cpu_seconds() - children_start
+    wall = time.perf_counter() - wall_start
+    rss_peak = rss_bytes()
+    late = [value for guild in guilds if guild.voice_client for value in guild.voice_client.late]
+    steady.set()
+
+    outcomes = await asyncio.gather(*guild_tasks, return_exceptions=True)
+    failures = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+    stop.set()
+    await lag_task
+    await cog.extractor.close()
+    if runner is not None:
+        await runner.cleanup()
+    tmpdir.cleanup()
+    if failures:
+        raise SystemExit(f'{len(failures)} guild(s) failed, first error: {failures[0]!r}')
+
+    print('latency')
+    report_latency('play -> audio', results['play'])
+    report_latency('enqueue', results['enqueue'])
+    report_latency('queue', results['queue'])
+    report_latency('button', results['control'])
+    report_latency('skip -> audio', results['skip'])
+    print(f'event loop lag       p50 {percentile(lag, 0.5) * 1000:.1f} ms   p99 {percentile(lag, 0.99) * 1000:.1f} ms   '
+          f'max {max(lag, default=0) * 1000:.1f} ms')
+    print(f'20 ms sends late     {len(late)} of {sum(g.voice_client.frames_sent for g in guilds if g.voice_client)}'
+          + (f', median {statistics.median(late) * 1000:.1f} ms' if late else ''))
+    if streams:
+        print(f'CPU per stream       {cpu / wall / streams * 100:.2f}% of a core (bot) '
+              f'+ {children / wall / streams * 100:.2f}% (FFmpeg), {streams} streams')
+    print(f'memory per guild     {(rss_peak - rss_before) / args.guilds / 1024:.1f} KiB RSS')
+    shared = cog.playback_paths[PATH_SHARED]
+    print(f'pipelines            {sum(cog.playback_paths.values()) - shared} started, {shared} tracks joined a shared one')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -3,40 +3,88 @@ from discord.ext import commands
 import asyncio
 import logging
 import os
+import signal
 
-from config import BOT_TOKEN, COMMAND_PREFIX
+from config import (
+    BOT_TOKEN,
+    COMMAND_PREFIX,
+    SHARDING,
+    CLUSTER_ID,
+    SHARD_CLUSTERS,
+    COMMAND_SYNC_MODE,
+    COMMAND_SYNC_FILE,
+    COMMAND_SYNC_CONCURRENCY,
+)
+from services.command_sync import CommandSync
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
+log_format = '%(levelname)s:%(name)s:%(message)s'
+if SHARD_CLUSTERS > 1:
+    log_format = f'[cluster {CLUSTER_ID}] {log_format}'
+logging.basicConfig(level=logging.INFO, format=log_format)
 logger = logging.getLogger('discord_bot')
 
 # Set up intents
 intents = discord.Intents.default()
 intents.message_content = True
 intents.voice_states = True
-intents.reactions = True
 
-# Create bot instance
-bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=intents)
 
-
-@bot.event
-async def on_ready():
-    logger.info(f'{bot.user} has connected to Discord!')
-    logger.info(f'Bot is in {len(bot.guilds)} guild(s)')
+def create_bot(shard_ids=None, shard_count=None):
+    """Create the bot; with SHARDING it runs the given shards (all of them by default)."""
+    if SHARDING:
+        bot = commands.AutoShardedBot(
+            command_prefix=COMMAND_PREFIX, intents=intents, shard_ids=shard_ids, shard_count=shard_count
+        )
+    else:
+        bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=intents)
+    
+    state_file = COMMAND_SYNC_FILE
+    if SHARD_CLUSTERS > 1:
+        state_file = COMMAND_SYNC_FILE.with_name(f'{COMMAND_SYNC_FILE.stem}.{CLUSTER_ID}.json')
+    command_sync = CommandSync(
+        bot.tree, state_file, COMMAND_SYNC_MODE, COMMAND_SYNC_CONCURRENCY, sync_global=CLUSTER_ID == 0
+    )
+    command_sync.load()
+    synced = False
+    
+    @bot.event
+    async def on_ready():
+        nonlocal synced
+        logger.info(f'{bot.user} has connected to Discord!')
+        logger.info(f'Bot is in {len(bot.guilds)} guild(s)')
+        if SHARDING:
+            logger.info(f'Running shard(s) {sorted(bot.shards)} of {bot.shard_count}')
+        
+        # on_ready fires again after reconnects; commands only need syncing once per run
+        if synced:
+            return
+        synced = True
+        try:
+            await command_sync.sync(bot.guilds)
+        except Exception as e:
+            logger.error(f'Failed to sync commands: {e}')
+    
+    @bot.event
+    async def on_guild_join(guild):
+        try:
+            await command_sync.sync([guild])
+        except Exception as e:
+            logger.error(f'Failed to sync commands to {guild.name}: {e}')
+    
+    @bot.event
+    async def on_guild_remove(guild):
+        command_sync.forget(guild.id)
     
-    # Sync slash commands - guild-specific for instant availability
-    try:
-        for guild in bot.guilds:
-            bot.tree.copy_global_to(guild=guild)
-            synced = await bot.tree.sync(guild=guild)
-            logger.info(f'Synced {len(synced)} slash command(s) to {guild.name}')
-    except Exception as e:
-        logger.error(f'Failed to sync commands: {e}')
+    return bot
 
 
-async def main():
+async def main(shard_ids=None, shard_count=None):
+    bot = create_bot(shard_ids, shard_count)
     async with bot:
+        # Shut down cleanly on SIGTERM (systemd, docker stop) so player state is saved
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
         await bot.load_extension('cogs.music')
         await bot.start(BOT_TOKEN)
 
@@ -1,20 +1,115 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 import asyncio
-import yt_dlp
+import logging
 import os
-from pathlib import Path
+import statistics
+import time
+import weakref
+from collections import Counter
+from collections import OrderedDict
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-from config import MUSIC_FOLDER
+from config import (
+    MUSIC_FOLDER,
+    LIBRARY_INDEX_FILE,
+    LIBRARY_SCAN_INTERVAL,
+    LIBRARY_DEEP_SCAN_EVERY,
+    EXTRACT_CACHE_MAX_BYTES,
+    EXTRACT_CACHE_DEFAULT_TTL,
+    EXTRACT_CACHE_EXPIRY_MARGIN,
+    EXTRACT_WORKERS,
+    EXTRACT_BACKEND,
+    EXTRACT_TIMEOUT,
+    PREWARM_ENABLED,
+    PREWARM_SECONDS,
+    PREWARM_LEAD,
+    PLAYBACK_MODE,
+    PLAYLIST_MAX_ENTRIES,
+    PLAYLIST_RESOLVE_AHEAD,
+    OPUS_CACHE_ENABLED,
+    OPUS_CACHE_DIR,
+    OPUS_CACHE_WORKERS,
+    OPUS_CACHE_BITRATE,
+    TRACK_CACHE_ENABLED,
+    TRACK_CACHE_DIR,
+    TRACK_CACHE_MAX_BYTES,
+    TRACK_CACHE_MIN_PLAYS,
+    STATE_ENABLED,
+    STATE_DB,
+    STATE_FLUSH_INTERVAL,
+    STATE_CACHE_MAX_AGE,
+    METRICS_ENABLED,
+    METRICS_HOST,
+    METRICS_PORT,
+    METRICS_SLOW_TRACE_SECONDS,
+    SHARD_CLUSTERS,
+    CLUSTER_ID,
+    REAPER_INTERVAL,
+    VOICE_EMPTY_TIMEOUT,
+    VOICE_IDLE_TIMEOUT,
+    VOICE_PAUSED_TIMEOUT,
+    PLAYER_IDLE_TTL,
+    LOUDNESS_ENABLED,
+    LOUDNESS_FILE,
+    LOUDNESS_WORKERS,
+    LOUDNESS_TARGET,
+    LOUDNESS_MAX_GAIN,
+    LOUDNESS_MIN_GAIN,
+    FANOUT_ENABLED,
+    FANOUT_BUFFER_SECONDS,
+    JITTER_BUFFER_SECONDS,
+    CLIP_CACHE_ENABLED,
+    CLIP_CACHE_SONGS,
+    CLIP_CACHE_MAX_FILE_SIZE,
+    CLIP_CACHE_MAX_BYTES,
+    AUTOCOMPLETE_REMOTE,
+    AUTOCOMPLETE_MIN_CHARS,
+    AUTOCOMPLETE_THROTTLE,
+    AUTOCOMPLETE_CACHE_TTL,
+    AUTOCOMPLETE_TIMEOUT,
+)
+from services.extraction_cache import ExtractionCache, ENTRY_OVERHEAD, normalize_query
+from services.extractor import ExtractionService, is_playlist_url
+from services.library import LibraryIndex, probe_files
+from services.opus_cache import OpusCache, OggOpusSource
+from services.clip_cache import ClipCache, ClipSource
+from services.track_cache import TrackCache
+from services.loudness import LoudnessAnalyzer
+from services.songs import Song, SongQueue
+from services.state_store import StateStore
+from services.metrics import Metrics, MetricsServer
+from services.search_index import TitleIndex
+from services.playback import (
+    BufferStats,
+    FRAMES_PER_SECOND,
+    JitterBuffer,
+    PrewarmedSource,
+    PATH_CLIP,
+    PATH_LABELS,
+    PATH_OPUS_CACHE,
+    PATH_SHARED,
+    open_ffmpeg_source,
+)
+from services.fanout import FanoutHub
+
+logger = logging.getLogger('discord_bot.music')
 
 # Supported audio file extensions
 AUDIO_EXTENSIONS = {'.mp3', '.wav', '.flac', '.ogg', '.m4a', '.opus', '.aac', '.wma'}
 
+# /play autocomplete: suggestions per source (Discord shows at most 25), titles
+# of resolved YouTube tracks kept for suggesting, and cached searches
+LIBRARY_SUGGESTIONS = 10
+RESOLVED_SUGGESTIONS = 5
+RESOLVED_TITLES_MAX = 5000
+SEARCH_CACHE_MAX = 500
+
 # yt-dlp options for audio-only extraction
 YDL_OPTIONS = {
-    'format': 'bestaudio/best',
+    'format': 'bestaudio[acodec=opus]/bestaudio/best',  # Prefer Opus so it can be passed through
     'noplaylist': True,
     'quiet': True,
     'no_warnings': True,
@@ -40,36 +135,155 @@ EMOJI_SKIP = '⏭️'
 EMOJI_STOP = '⏹️'
 EMOJI_QUEUE = '📜'
 EMOJI_NINJA = '🥷'  # Plays song #2
-CONTROL_EMOJIS = [EMOJI_PAUSE, EMOJI_RESUME, EMOJI_SKIP, EMOJI_STOP, EMOJI_QUEUE, EMOJI_NINJA]
 
+# Songs per page of !queue
+QUEUE_PAGE_SIZE = 10
+
+# A stream ending more than this many seconds before the track's duration was
+# cut off (typically its URL expired or was refused with HTTP 403); it is
+# re-resolved and restarted at the same position, at most STREAM_RETRIES times
+STREAM_END_TOLERANCE = 5
+STREAM_RETRIES = 2
+
+
+def format_duration(seconds):
+    """Format seconds as m:ss, or h:mm:ss for an hour or more."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f'{hours}:{minutes:02d}:{seconds:02d}'
+    return f'{minutes}:{seconds:02d}'
 
-def get_local_songs():
-    """Get list of audio files from the music folder."""
-    songs = []
-    music_path = Path(MUSIC_FOLDER)
+
+def parse_position(text, current=0.0):
+    """Parse a seek position: seconds, m:ss or h:mm:ss, or +/- relative to current."""
+    text = text.strip()
+    sign = text[:1] if text[:1] in '+-' else ''
+    parts = text[len(sign):].split(':')
+    if not 1 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+        return None
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + int(part)
+    if sign == '+':
+        return current + seconds
+    if sign == '-':
+        return max(0.0, current - seconds)
+    return float(seconds)
+
+
+class PlayerControls(discord.ui.View):
+    """Persistent playback buttons attached to now playing messages.
+    
+    The custom IDs are fixed, so buttons keep working on messages sent
+    before a restart once the view is registered with ``bot.add_view``.
+    """
     
-    if not music_path.exists():
-        return songs
+    def __init__(self, cog):
+        super().__init__(timeout=None)
+        self.cog = cog
     
-    for file in sorted(music_path.iterdir()):
-        if file.is_file() and file.suffix.lower() in AUDIO_EXTENSIONS:
-            songs.append(file)
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.guild is not None
     
-    return songs
+    @discord.ui.button(emoji=EMOJI_PAUSE, style=discord.ButtonStyle.secondary, custom_id='music:pause', row=0)
+    async def pause(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog.handle_control(interaction, 'pause')
+    
+    @discord.ui.button(emoji=EMOJI_RESUME, style=discord.ButtonStyle.secondary, custom_id='music:resume', row=0)
+    async def resume(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog.handle_control(interaction, 'resume')
+    
+    @discord.ui.button(emoji=EMOJI_SKIP, style=discord.ButtonStyle.secondary, custom_id='music:skip', row=0)
+    async def skip(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog.handle_control(interaction, 'skip')
+    
+    @discord.ui.button(emoji=EMOJI_STOP, style=discord.ButtonStyle.danger, custom_id='music:stop', row=0)
+    async def stop_playback(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog.handle_control(interaction, 'stop')
+    
+    @discord.ui.button(emoji=EMOJI_QUEUE, label='Queue', style=discord.ButtonStyle.primary, custom_id='music:queue', row=1)
+    async def queue(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog.handle_control(interaction, 'queue')
+    
+    @discord.ui.button(emoji=EMOJI_NINJA, label='#2', style=discord.ButtonStyle.primary, custom_id='music:ninja', row=1)
+    async def ninja(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog.handle_control(interaction, 'ninja')
+
+
+class RestoredContext:
+    """Stands in for a command context when playback resumes after a restart."""
+    
+    def __init__(self, channel):
+        self.guild = channel.guild
+        self.channel = channel
+    
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
 
 
 class MusicPlayer:
     """Manages the music queue and playback for a guild."""
     
     def __init__(self):
-        self.queue = deque()
+        self.queue = SongQueue()
         self.current = None
         self.loop = False
+        self.text_channel_id = None  # where now playing messages go
+        self.source = None  # PrewarmedSource of the current track
+        self.start_offset = 0  # seconds into the track the source started at
+        self.restart_at = None  # seconds to restart the current track at when it next starts (seek, restored player)
+        self.stream_retries = 0  # restarts of the current track after its stream was cut off
+        self.saved = None  # state signature last written to the state store
+        self.saved_queue = None  # (queue.layout, seq after the last saved song) in the state store
         self.now_playing_message = None
+        self.prefetch_task = None
+        self.prefetched = None  # (song, PrewarmedSource) ready for the next track
+        self.start_lock = asyncio.Lock()  # held while play_next resolves and starts a track
+        self.trace = None  # metrics Trace of the request waiting for its first packet
+        self.track_ended_at = None  # perf_counter() when the last track finished
+        self.last_gap = None  # seconds of silence at the last track change
+        self.buffer_stats = BufferStats()  # jitter buffer underruns and fill level
+        self.last_activity = time.monotonic()  # last command, button or track change
+        self.empty_since = None  # monotonic() when the voice channel was first seen without listeners
+        self.leaving = False  # the reaper is disconnecting; the stopped track must not restart
+    
+    @property
+    def position(self):
+        """Seconds into the current track, counted from the frames sent to Discord."""
+        if self.source is None:
+            return self.restart_at or 0.0  # not started yet: where it will start
+        return self.start_offset + self.source.frames_read / FRAMES_PER_SECOND
     
     def add(self, song):
         self.queue.append(song)
     
+    def peek(self):
+        """Return the song that next() would return, without advancing."""
+        if self.loop and self.current:
+            return self.current
+        return self.queue[0] if self.queue else None
+    
+    def upcoming(self, count):
+        """Return up to count songs from the front of the queue."""
+        return self.queue.slice(0, count)
+    
+    def take_prefetched(self, song):
+        """Return the prewarmed source for song, discarding any other prefetch."""
+        prefetched, self.prefetched = self.prefetched, None
+        if prefetched is None:
+            return None
+        if prefetched[0] is song:
+            return prefetched[1]
+        prefetched[1].cleanup()
+        return None
+    
+    def cancel_prefetch(self):
+        if self.prefetch_task is not None:
+            self.prefetch_task.cancel()
+            self.prefetch_task = None
+        self.take_prefetched(None)
+    
     def next(self):
         if self.loop and self.current:
             return self.current
@@ -82,6 +296,8 @@ class MusicPlayer:
     def clear(self):
         self.queue.clear()
         self.current = None
+        self.restart_at = None
+        self.cancel_prefetch()
 
 
 class Music(commands.Cog):
@@ -90,133 +306,1022 @@ class Music(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.players = {}  # guild_id -> MusicPlayer
+        self.evicted = []  # guild IDs of players dropped by the reaper, for the state store
+        self.sources = weakref.WeakSet()  # every PrewarmedSource still alive, for the reaper
+        self.background_tasks = set()  # fire-and-forget tasks, referenced until they finish
+        self.fanout = FanoutHub(FANOUT_BUFFER_SECONDS * FRAMES_PER_SECOND) if FANOUT_ENABLED else None
+        self.extract_cache = ExtractionCache(
+            EXTRACT_CACHE_MAX_BYTES,
+            default_ttl=EXTRACT_CACHE_DEFAULT_TTL,
+            expiry_margin=EXTRACT_CACHE_EXPIRY_MARGIN,
+        )
+        self.extractor = ExtractionService(
+            YDL_OPTIONS,
+            workers=EXTRACT_WORKERS,
+            backend=EXTRACT_BACKEND,
+            timeout=EXTRACT_TIMEOUT,
+            playlist_limit=PLAYLIST_MAX_ENTRIES,
+        )
+        self.gaps = deque(maxlen=500)  # recent inter-track gaps in seconds
+        self.playback_paths = Counter()  # PATH_* -> tracks started that way
+        self.library = LibraryIndex(MUSIC_FOLDER, LIBRARY_INDEX_FILE, AUDIO_EXTENSIONS)
+        # With several shard clusters only cluster 0 scans the folder and writes the index
+        self.owns_library = CLUSTER_ID == 0
+        self.library_scans = 0
+        self.probe_task = None
+        self.opus_cache = None
+        if OPUS_CACHE_ENABLED:
+            self.opus_cache = OpusCache(OPUS_CACHE_DIR, OPUS_CACHE_WORKERS or None, OPUS_CACHE_BITRATE)
+        self.transcode_task = None
+        self.clip_cache = ClipCache(CLIP_CACHE_MAX_BYTES) if CLIP_CACHE_ENABLED else None
+        self.clip_task = None
+        self.track_cache = None
+        if TRACK_CACHE_ENABLED:
+            track_cache_dir = TRACK_CACHE_DIR
+            if SHARD_CLUSTERS > 1:
+                # The index is rewritten on every download, keep one per process
+                track_cache_dir = TRACK_CACHE_DIR / f'cluster-{CLUSTER_ID}'
+            self.track_cache = TrackCache(
+                track_cache_dir, TRACK_CACHE_MAX_BYTES // SHARD_CLUSTERS, TRACK_CACHE_MIN_PLAYS, YDL_OPTIONS
+            )
+        self.loudness = None
+        if LOUDNESS_ENABLED:
+            loudness_file = LOUDNESS_FILE
+            if SHARD_CLUSTERS > 1:
+                # Remote tracks are cached per process, and so are their measurements
+                loudness_file = LOUDNESS_FILE.with_name(f'{LOUDNESS_FILE.stem}-cluster-{CLUSTER_ID}.json')
+            self.loudness = LoudnessAnalyzer(
+                loudness_file, LOUDNESS_WORKERS or None, LOUDNESS_TARGET, LOUDNESS_MAX_GAIN
+            )
+        self.transcode_loudness = None  # loudness.version the last Opus cache build started with
+        self.state = None
+        self.state_executor = None
+        self.saved_players = []  # rows loaded at startup, restored once the bot is ready
+        if STATE_ENABLED:
+            self.state = StateStore(STATE_DB)
+            # SQLite connections stay on one thread
+            self.state_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='state')
+        # Search-as-you-type for /play: local songs, and YouTube tracks resolved or found before
+        self.library_titles = TitleIndex()
+        self.resolved_titles = TitleIndex(max_entries=RESOLVED_TITLES_MAX)
+        self.search_cache = OrderedDict()  # normalized query -> (expires_at, [flat info])
+        self.search_tasks = {}  # normalized query -> Task of a search in flight
+        self.search_throttle = {}  # user_id -> monotonic time of their last search
+        self.setup_metrics()
+    
+    def setup_metrics(self):
+        self.metrics = Metrics(slow_trace_seconds=METRICS_SLOW_TRACE_SECONDS)
+        self.metrics_server = None
+        if METRICS_ENABLED:
+            # One port per shard cluster
+            self.metrics_server = MetricsServer(self.metrics, METRICS_HOST, METRICS_PORT + CLUSTER_ID)
+        metrics = self.metrics
+        self.extract_seconds = metrics.histogram('extract_seconds', 'extract_info latency by cache result')
+        self.ffmpeg_spawn_seconds = metrics.histogram('ffmpeg_spawn_seconds', 'Time to start an audio source by playback path')
+        self.gap_seconds = metrics.histogram('gap_seconds', 'Silence between the end of a track and the next first packet')
+        self.extraction_failures = metrics.counter('extraction_failures_total', 'yt-dlp extractions that failed')
+        self.ffmpeg_spawns = metrics.counter('ffmpeg_spawns_total', 'Audio sources started by playback path')
+        self.ffmpeg_restarts = metrics.counter(
+            'ffmpeg_restarts_total', 'Pipelines started again for a track: discarded prewarms and mid-track restarts'
+        )
+        self.playback_errors = metrics.counter('playback_errors_total', 'Tracks that ended with a player error')
+        self.stream_recoveries = metrics.counter(
+            'stream_recoveries_total', 'Streams cut off early, re-resolved and restarted at their position'
+        )
+        self.reaped = metrics.counter('reaped_total', 'Resources freed by the idle reaper by kind')
+        self.autocomplete_seconds = metrics.histogram('autocomplete_seconds', '/play autocomplete latency by result')
+        metrics.gauge('voice_clients', 'Connected voice clients', lambda: len(self.bot.voice_clients))
+        metrics.gauge('players', 'Guild players in memory', lambda: len(self.players))
+        metrics.gauge('queued_songs', 'Songs waiting in all queues', lambda: sum(len(p.queue) for p in self.players.values()))
+        metrics.gauge('extract_cache_bytes', 'Approximate extraction cache size', lambda: self.extract_cache.size)
+        metrics.gauge(
+            'extractor_jobs', 'Extraction jobs by state',
+            lambda: {key: self.extractor.stats()[key] for key in ('running', 'queued')}, label='state'
+        )
+        metrics.gauge('extractor_restarts', 'Extraction worker process restarts', lambda: self.extractor.stats()['restarts'])
+        if JITTER_BUFFER_SECONDS > 0:
+            metrics.gauge(
+                'jitter_underruns', 'Times the jitter buffer ran dry mid-track by guild',
+                lambda: {guild_id: p.buffer_stats.underruns for guild_id, p in self.players.items()}, label='guild'
+            )
+            metrics.gauge(
+                'jitter_stall_seconds', 'Time the player waited for audio after an underrun by guild',
+                lambda: {guild_id: p.buffer_stats.stall_seconds for guild_id, p in self.players.items()}, label='guild'
+            )
+            metrics.gauge(
+                'jitter_fill_seconds', 'Audio buffered ahead of the player by guild',
+                lambda: {guild_id: p.buffer_stats.fill / FRAMES_PER_SECOND for guild_id, p in self.players.items()},
+                label='guild'
+            )
+        if self.clip_cache is not None:
+            metrics.gauge('clip_cache_bytes', 'Memory held by preloaded clips', lambda: self.clip_cache.size)
+        if self.fanout is not None:
+            metrics.gauge(
+                'fanout', 'Shared pipelines and their listeners',
+                lambda: {key: self.fanout.stats()[key] for key in ('pipelines', 'listeners')}, label='kind'
+            )
+    
+    async def cog_load(self):
+        self.extractor.start()
+        self.bot.add_view(PlayerControls(self))
+        
+        # Build the library index once; the watcher keeps it current afterwards
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.library.load)
+        self.index_library_titles()
+        if self.opus_cache is not None:
+            await loop.run_in_executor(None, self.opus_cache.load)
+        if self.track_cache is not None:
+            await loop.run_in_executor(None, self.track_cache.load)
+        if self.loudness is not None:
+            await loop.run_in_executor(None, self.loudness.load)
+            self.loudness.start()
+        if self.owns_library:
+            await self.refresh_library(deep=True)
+        self.library_watcher.change_interval(seconds=LIBRARY_SCAN_INTERVAL)
+        self.library_watcher.start()
+        self.idle_reaper.change_interval(seconds=REAPER_INTERVAL)
+        self.idle_reaper.start()
+        
+        if self.metrics_server is not None:
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                logger.warning(f'Could not start the metrics endpoint: {e}')
+                self.metrics_server = None
+        
+        if self.state is not None:
+            await self.load_state()
+            self.state_flusher.change_interval(seconds=STATE_FLUSH_INTERVAL)
+            self.state_flusher.start()
+            if self.bot.is_ready():
+                self.spawn(self.restore_players())
+    
+    async def cog_unload(self):
+        self.library_watcher.cancel()
+        self.idle_reaper.cancel()
+        for task in (self.probe_task, self.transcode_task, self.clip_task, *self.background_tasks):
+            if task is not None:
+                task.cancel()
+        if self.owns_library:
+            self.library.save()
+        if self.track_cache is not None:
+            self.track_cache.save()
+            self.track_cache.close()
+        if self.state is not None:
+            self.state_flusher.cancel()
+            # Final flush, so a clean shutdown resumes from the exact position. It
+            # runs on the state thread, after any flush already in progress there,
+            # since the SQLite connection belongs to that thread.
+            changes = self.snapshot_state()
+            
+            def flush():
+                try:
+                    self.state.write(**changes)
+                finally:
+                    self.state.close()
+            
+            self.state_executor.submit(flush)
+            self.state_executor.shutdown(wait=True)
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        if self.loudness is not None:
+            await self.loudness.close()
+        await self.extractor.close()
+    
+    def spawn(self, coro):
+        """Run a coroutine in the background, keeping a reference (the loop only keeps a weak one)."""
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_done)
+        return task
+    
+    def background_done(self, task):
+        self.background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f'Background task failed: {task.exception()!r}')
+    
+    async def load_state(self):
+        """Open the state store and load saved metadata and players."""
+        loop = asyncio.get_running_loop()
+        
+        def load():
+            self.state.open()
+            self.state.prune_extractions(STATE_CACHE_MAX_AGE)
+            limit = EXTRACT_CACHE_MAX_BYTES // ENTRY_OVERHEAD
+            return self.state.load_extractions(limit), self.state.load_players()
+        
+        try:
+            extractions, self.saved_players = await loop.run_in_executor(self.state_executor, load)
+        except Exception as e:
+            logger.warning(f'Could not load saved state: {e}')
+            self.state = None
+            return
+        # Metadata only: expired stream URLs are refreshed when the track is next played
+        for info, expires_at, queries in extractions:
+            self.extract_cache.restore(info, expires_at, queries)
+            self.remember_title(info)
+        logger.info(f'Loaded {len(extractions)} cached extraction(s) and {len(self.saved_players)} saved player(s)')
+    
+    def snapshot_state(self):
+        """Collect what changed since the last flush, as keyword arguments for StateStore.write."""
+        players, queues, queue_changes, positions = [], [], [], []
+        deleted, self.evicted = self.evicted, []
+        for guild_id, player in self.players.items():
+            guild = self.bot.get_guild(guild_id)
+            voice_client = guild.voice_client if guild is not None else None
+            voice_channel_id = voice_client.channel.id if voice_client is not None and voice_client.channel else None
+            
+            if player.current is None and not player.queue:
+                if player.saved is not None:
+                    deleted.append(guild_id)
+                    player.saved = None
+                    player.saved_queue = None
+                continue
+            
+            signature = (player.current, voice_channel_id, player.text_channel_id, player.loop, player.queue.version)
+            if signature != player.saved:
+                current = player.current.to_dict() if player.current else None
+                players.append((
+                    guild_id, voice_channel_id, player.text_channel_id, player.loop, current, player.position
+                ))
+                queue = player.queue
+                head, end = queue.popped, queue.popped + len(queue)
+                if player.saved_queue is None or player.saved_queue[0] != queue.layout:
+                    # Rearranged (shuffle, move, remove...): rewrite it
+                    queues.append((guild_id, head, [song.to_dict() for song in queue]))
+                elif player.saved is None or player.saved[-1] != queue.version:
+                    # Only popped and appended to: drop played rows, add the new ones
+                    saved_end = max(player.saved_queue[1], head)
+                    appended = queue.slice(saved_end - head, len(queue))
+                    queue_changes.append((
+                        guild_id, head, [(seq, song.to_dict()) for seq, song in enumerate(appended, saved_end)]
+                    ))
+                player.saved = signature
+                player.saved_queue = (queue.layout, end)
+            elif voice_client is not None and voice_client.is_playing():
+                positions.append((player.position, guild_id))
+        
+        return {
+            'players': players,
+            'queues': queues,
+            'queue_changes': queue_changes,
+            'positions': positions,
+            'deleted': deleted,
+            'extractions': self.extract_cache.take_dirty(),
+        }
+    
+    @tasks.loop(seconds=5)
+    async def state_flusher(self):
+        changes = self.snapshot_state()
+        if not any(changes.values()):
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.state_executor, lambda: self.state.write(**changes))
+        except Exception as e:
+            logger.warning(f'Could not save player state: {e}')
+    
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await self.restore_players()
+    
+    async def restore_players(self):
+        """Rebuild players saved by the previous run and resume the ones that were playing."""
+        saved_players, self.saved_players = self.saved_players, []
+        resumes = []
+        for saved in saved_players:
+            guild = self.bot.get_guild(saved['guild_id'])
+            if guild is None:
+                continue
+            player = self.get_player(guild.id)
+            if player.current is not None or player.queue:
+                continue  # already in use again
+            
+            player.loop = saved['loop']
+            player.text_channel_id = saved['text_channel_id']
+            player.queue.extend(Song.from_dict(data) for data in saved['queue'])
+            if saved['current'] is None:
+                continue
+            # The interrupted track restarts where it stopped, whenever playback
+            # starts again: now, or on the next !play or resume if nobody is listening
+            player.current = Song.from_dict(saved['current'])
+            player.restart_at = saved['position']
+            
+            voice_channel = guild.get_channel(saved['voice_channel_id'] or 0)
+            text_channel = guild.get_channel(saved['text_channel_id'] or 0)
+            if voice_channel is None or text_channel is None:
+                continue
+            if not any(not member.bot for member in voice_channel.members):
+                continue  # nobody left to listen, keep the queue for the next !play
+            resumes.append(self.resume_player(voice_channel, text_channel))
+        
+        if resumes:
+            logger.info(f'Resuming playback in {len(resumes)} guild(s)')
+            await asyncio.gather(*resumes, return_exceptions=True)
+    
+    async def resume_player(self, voice_channel, text_channel):
+        try:
+            if voice_channel.guild.voice_client is None:
+                await voice_channel.connect(timeout=10.0)
+        except (asyncio.TimeoutError, discord.ClientException) as e:
+            logger.warning(f'Could not rejoin {voice_channel.name}: {e}')
+            return
+        await self.play_next(RestoredContext(text_channel))
+    
+    async def refresh_library(self, deep=False):
+        """Pick up added, removed and changed files in the music folder."""
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, self.library.scan, deep)
+        self.library.apply(result)
+        
+        if self.probe_task is None or self.probe_task.done():
+            if self.library.unprobed():
+                self.probe_task = asyncio.create_task(self.probe_library())
+        if self.loudness is not None:
+            for entry in self.library:
+                self.library_gain(entry)  # queues songs not measured yet
+            await self.prune_loudness()
+        if self.opus_cache is not None and (self.transcode_task is None or self.transcode_task.done()):
+            # Rebuilt after new loudness measurements too, to apply their gain
+            loudness = self.loudness.version if self.loudness is not None else None
+            if result or self.transcode_task is None or loudness != self.transcode_loudness:
+                self.transcode_loudness = loudness
+                self.transcode_task = asyncio.create_task(self.opus_cache.build(self.library, self.library_gain))
+        self.index_library_titles()
+        self.preload_clips()
+        await loop.run_in_executor(None, self.library.save)
+    
+    async def prune_loudness(self):
+        """Forget loudness measurements of removed songs and of downloads the track cache evicted."""
+        keys = {f'file:{entry.path}' for entry in self.library}
+        if self.track_cache is not None:
+            keys.update(f'track:{video_id}' for video_id in self.track_cache.video_ids())
+        if self.loudness.retain(keys):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.loudness.save)
+    
+    async def probe_library(self, batch=100):
+        """Fill in durations and tags for songs that have not been probed yet."""
+        loop = asyncio.get_running_loop()
+        pending = self.library.unprobed()
+        try:
+            for start in range(0, len(pending), batch):
+                entries = pending[start:start + batch]
+                paths = [self.library.absolute_path(entry) for entry in entries]
+                results = await loop.run_in_executor(None, probe_files, paths)
+                for entry, metadata in zip(entries, results):
+                    self.library.set_metadata(entry, metadata)
+                self.index_library_titles()
+                await loop.run_in_executor(None, self.library.save)
+        except FileNotFoundError:
+            logger.warning('ffprobe not found, local song durations will be unknown')
+    
+    @tasks.loop(seconds=60)
+    async def library_watcher(self):
+        if not self.owns_library:
+            # Another shard cluster scans the folder; pick up the index files it wrote
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.library.reload)
+            self.index_library_titles()
+            if self.opus_cache is not None:
+                await loop.run_in_executor(None, self.opus_cache.reload)
+            self.preload_clips()
+            if self.loudness is not None:
+                await self.prune_loudness()
+            return
+        self.library_scans += 1
+        deep = self.library_scans % LIBRARY_DEEP_SCAN_EVERY == 0
+        try:
+            await self.refresh_library(deep=deep)
+        except Exception as e:
+            logger.warning(f'Library scan failed: {e}')
     
     def get_player(self, guild_id):
         if guild_id not in self.players:
             self.players[guild_id] = MusicPlayer()
-        return self.players[guild_id]
+        player = self.players[guild_id]
+        player.last_activity = time.monotonic()
+        return player
     
-    async def extract_info(self, query):
+    @tasks.loop(seconds=30)
+    async def idle_reaper(self):
+        try:
+            await self.reap_idle()
+        except Exception as e:
+            logger.warning(f'Idle reaper failed: {e}')
+    
+    async def reap_idle(self):
+        """Leave empty or idle voice channels, kill unused FFmpeg processes and forget stale players."""
+        now = time.monotonic()
+        
+        for voice_client in list(self.bot.voice_clients):
+            guild = voice_client.guild
+            player = self.players.get(guild.id)
+            if player is None:
+                # Connected without a player (e.g. after an eviction race), nothing to keep
+                await self.reap_voice(guild, voice_client, None, 'orphan')
+                continue
+            
+            listeners = any(not member.bot for member in getattr(voice_client.channel, 'members', ()))
+            if listeners:
+                player.empty_since = None
+            elif player.empty_since is None:
+                player.empty_since = now
+            
+            if voice_client.is_playing():
+                player.last_activity = now
+            timeout = VOICE_PAUSED_TIMEOUT if voice_client.is_paused() else VOICE_IDLE_TIMEOUT
+            if player.empty_since is not None and now - player.empty_since >= VOICE_EMPTY_TIMEOUT:
+                await self.reap_voice(guild, voice_client, player, 'empty')
+            elif now - player.last_activity >= timeout:
+                await self.reap_voice(guild, voice_client, player, 'idle')
+        
+        # FFmpeg processes held by sources no player plays or has prefetched
+        in_use = set()
+        for player in self.players.values():
+            in_use.add(player.source)
+            if player.prefetched is not None:
+                in_use.add(player.prefetched[1])
+        for source in list(self.sources):
+            if source.closed or source in in_use:
+                continue
+            # Prefetches are created a moment before the player picks them up
+            if now - source.created_at < REAPER_INTERVAL:
+                continue
+            process = source.process
+            if process is not None and process.poll() is None:
+                logger.info(f'Killing orphaned FFmpeg process {process.pid}')
+                self.reaped.inc(kind='ffmpeg')
+            source.cleanup()
+        
+        # Players whose guild is gone, or that sat disconnected and unused for too long
+        for guild_id, player in list(self.players.items()):
+            guild = self.bot.get_guild(guild_id)
+            if guild is not None and guild.voice_client is not None:
+                continue
+            if guild is None or now - player.last_activity >= PLAYER_IDLE_TTL:
+                player.clear()
+                player.now_playing_message = None
+                player.source = None
+                del self.players[guild_id]
+                if player.saved is not None:
+                    self.evicted.append(guild_id)
+                    player.saved_queue = None
+                self.reaped.inc(kind='player')
+    
+    async def reap_voice(self, guild, voice_client, player, reason):
+        logger.info(f'Leaving voice in {guild.name} ({reason})')
+        self.reaped.inc(kind=f'voice_{reason}')
+        if player is not None:
+            # Keep the queue and the position, so the next !play or resume continues there
+            if player.current is not None and player.restart_at is None:
+                player.restart_at = player.position
+            player.cancel_prefetch()
+            player.leaving = True
+            player.empty_since = None
+            player.now_playing_message = None
+        try:
+            voice_client.stop()
+            await voice_client.disconnect()
+        except Exception as e:
+            logger.warning(f'Could not disconnect from {guild.name}: {e}')
+        finally:
+            if player is not None:
+                player.leaving = False
+    
+    async def extract_info(self, query, guild_id=None):
         """Extract audio info using yt-dlp Python bindings (audio only).
         
         Supports:
         - Direct YouTube URLs
         - Plain text search (automatically searches YouTube and picks first result)
+        
+        Results are served from the extraction cache when possible. A cached
+        entry whose stream URL has expired only has its URL re-resolved.
         """
-        loop = asyncio.get_event_loop()
+        started = time.perf_counter()
+        entry = self.extract_cache.get(query)
+        shared = False
+        if entry is None and self.state is not None:
+            entry = await self.load_shared_extraction(query)
+            shared = entry is not None
+        self.extract_cache.count(entry, shared)
+        if entry is not None:
+            result = 'shared' if shared else 'hit'
+            if not entry.is_fresh(self.extract_cache.expiry_margin):
+                # Metadata is still good, only the googlevideo URL went stale
+                result = 'refresh'
+                info = await self._extract(entry.info['webpage_url'], guild_id)
+                self.extract_cache.refresh_url(entry, info['url'])
+            self.extract_seconds.observe(time.perf_counter() - started, result=result)
+            return dict(entry.info)
         
-        with yt_dlp.YoutubeDL(YDL_OPTIONS) as ydl:
-            try:
-                # Check if it's a URL or search query
-                if not query.startswith(('http://', 'https://')):
-                    # Plain text -> search YouTube for first result
-                    query = f'ytsearch1:{query}'
-                
-                info = await loop.run_in_executor(
-                    None, 
-                    lambda: ydl.extract_info(query, download=False)
-                )
-                
-                # Handle search results (ytsearch returns entries)
-                if 'entries' in info:
-                    if not info['entries']:
-                        raise Exception('No results found')
-                    info = info['entries'][0]
-                
-                return {
-                    'url': info['url'],
-                    'title': info.get('title', 'Unknown'),
-                    'duration': info.get('duration', 0),
-                    'thumbnail': info.get('thumbnail'),
-                    'webpage_url': info.get('webpage_url', query),
-                    'is_local': False,
-                }
-            except Exception as e:
-                raise Exception(f'Failed to extract audio: {str(e)}')
+        info = await self._extract(query, guild_id)
+        self.extract_cache.put(query, info)
+        self.remember_title(info)
+        self.extract_seconds.observe(time.perf_counter() - started, result='miss')
+        return info
+    
+    async def load_shared_extraction(self, query):
+        """Look a cache miss up in the state store, where other shard clusters save theirs."""
+        loop = asyncio.get_running_loop()
+        try:
+            saved = await loop.run_in_executor(self.state_executor, self.state.get_extraction, normalize_query(query))
+        except Exception as e:
+            logger.warning(f'Shared extraction lookup failed: {e}')
+            return None
+        if saved is None:
+            return None
+        self.extract_cache.restore(*saved)
+        self.remember_title(saved[0])
+        return self.extract_cache.get(query)
+    
+    async def _extract(self, query, guild_id=None):
+        """Run a full yt-dlp extraction on the extraction service."""
+        try:
+            return await self.extractor.extract(query, guild_id)
+        except Exception as e:
+            self.extraction_failures.inc()
+            raise Exception(f'Failed to extract audio: {str(e)}')
     
     def get_local_song_info(self, song_number: int):
         """Get local song info by number (1-indexed)."""
-        songs = get_local_songs()
-        
-        if not songs:
+        if not len(self.library):
             raise Exception('No audio files found')
         
-        if song_number < 1 or song_number > len(songs):
-            raise Exception(f'Invalid song number. Choose 1-{len(songs)}')
-        
-        song_path = songs[song_number - 1]
+        entry = self.library.get(song_number)
+        if entry is None:
+            # Numbers of removed songs are never reused, so there are gaps
+            raise Exception(f'No song #{song_number}, see `!list` for the local songs')
         
-        return {
-            'url': str(song_path),
-            'title': f'Song #{song_number}',  # Just show the number
-            'duration': 0,
-            'thumbnail': None,
-            'webpage_url': None,
-            'is_local': True,
-        }
+        return Song(
+            f'Song #{song_number}',  # Just show the number
+            str(self.library.absolute_path(entry)),
+            number=song_number,
+            duration=entry.duration,
+            codec=entry.codec,
+            is_local=True,
+        )
     
-    async def send_now_playing(self, ctx, song):
-        """Send a now playing message with reaction controls."""
-        player = self.get_player(ctx.guild.id)
-        
+    def build_now_playing_embed(self, song):
         embed = discord.Embed(
             title='🎵 Now Playing',
-            description=f'**{song["title"]}**',
+            description=f'**{song.title}**',
             color=discord.Color.green()
         )
         
-        if song.get('thumbnail'):
-            embed.set_thumbnail(url=song['thumbnail'])
+        if song.thumbnail:
+            embed.set_thumbnail(url=song.thumbnail)
         
-        if song.get('duration') and song['duration'] > 0:
-            minutes, seconds = divmod(song['duration'], 60)
-            embed.add_field(name='Duration', value=f'{minutes}:{seconds:02d}')
+        if song.duration > 0:
+            embed.add_field(name='Duration', value=format_duration(song.duration))
         
-        if song.get('is_local'):
+        if song.is_local:
             embed.add_field(name='Source', value='📁 Local File', inline=True)
         
-        # Add control instructions
-        embed.set_footer(text='⏸️ Pause | ▶️ Resume | ⏭️ Skip | ⏹️ Stop | 📜 Queue | 🥷 Play #2')
+        if song.playback_path:
+            embed.add_field(name='Audio', value=PATH_LABELS[song.playback_path], inline=True)
         
-        # Send message and add reactions
-        msg = await ctx.channel.send(embed=embed)
-        player.now_playing_message = msg
+        return embed
+    
+    def build_queue_embed(self, player, page=1):
+        """Build one page of the queue; only that page's songs are touched."""
+        pages = max(1, -(-len(player.queue) // QUEUE_PAGE_SIZE))
+        page = min(max(page, 1), pages)
+        start = (page - 1) * QUEUE_PAGE_SIZE
         
-        # Add control reactions
-        for emoji in CONTROL_EMOJIS:
-            try:
-                await msg.add_reaction(emoji)
-            except discord.HTTPException:
-                pass
+        embed = discord.Embed(title='🎵 Music Queue', color=discord.Color.blurple())
+        
+        if player.current:
+            source = '📁' if player.current.is_local else '🌐'
+            embed.add_field(
+                name='Now Playing',
+                value=f'{source} **{player.current.title}**',
+                inline=False
+            )
+        
+        if player.queue:
+            queue_list = '\n'.join(
+                f'{i}. {"📁" if song.is_local else "🌐"} {song.title}'
+                for i, song in enumerate(player.queue.slice(start, start + QUEUE_PAGE_SIZE), start + 1)
+            )
+            embed.add_field(name='Up Next', value=queue_list, inline=False)
+        
+        footer = f'Total in queue: {len(player.queue)} song(s)'
+        if player.queue.total_duration:
+            footer += f' | {format_duration(player.queue.total_duration)}'
+        if pages > 1:
+            footer += f' | Page {page}/{pages}'
+        embed.set_footer(text=footer)
+        return embed
     
-    async def play_next(self, ctx):
-        """Play the next song in the queue."""
+    async def send_now_playing(self, ctx, song):
+        """Send a now playing message with button controls (a single API call)."""
         player = self.get_player(ctx.guild.id)
-        song = player.next()
+        embed = self.build_now_playing_embed(song)
+        view = PlayerControls(self)
+        player.now_playing_message = await ctx.channel.send(embed=embed, view=view)
+        # The persistent view from cog_load handles the buttons; drop this one
+        # from discord.py's view store, which would otherwise keep it forever
+        view.stop()
+    
+    async def prepare_song(self, song, guild_id=None):
+        """Get a song ready to play: fresh stream URL and a known audio codec."""
+        if song.is_local:
+            if self.cached_opus_path(song) is not None:
+                return
+            if song.codec is None and PLAYBACK_MODE != 'pcm':
+                # Library entry not probed yet, ask FFmpeg directly
+                song.codec, _ = await discord.FFmpegOpusAudio.probe(song.url)
+            return
+        if not song.webpage_url:
+            return
+        if self.track_cache is not None:
+            cached = self.track_cache.lookup(song.id)
+            if cached is not None:
+                # Played from disk, the stream URL is not needed
+                song.cached_file, song.codec = str(cached[0]), cached[1]
+                return
+            song.cached_file = None
+        # Served straight from the extraction cache unless the URL went stale.
+        # Playlist entries start without a URL and are resolved here the first time.
+        info = await self.extract_info(song.webpage_url, guild_id)
+        song.url = info['url']
+        song.codec = info.get('codec')
+        if not song.thumbnail:
+            song.thumbnail = info.get('thumbnail')
+    
+    def cached_opus_path(self, song):
+        """Return the pre-transcoded Opus file for a local song, if it is up to date."""
+        if self.opus_cache is None or not song.number:
+            return None
+        entry = self.library.get(song.number)
+        return self.opus_cache.lookup(entry, self.library_gain(entry)) if entry is not None else None
+    
+    def is_clip(self, entry):
+        """True for library entries chosen to be preloaded as soundboard clips."""
+        if entry.number in CLIP_CACHE_SONGS:
+            return True
+        return CLIP_CACHE_MAX_FILE_SIZE > 0 and entry.size <= CLIP_CACHE_MAX_FILE_SIZE
+    
+    def clip_file(self, entry):
+        """Ogg Opus file to read a clip from: the song's Opus cache file, or the song itself if it is Ogg Opus."""
+        gain = self.library_gain(entry)
+        if self.opus_cache is not None:
+            cached = self.opus_cache.lookup(entry, gain)
+            if cached is not None:
+                return cached
+        path = self.library.absolute_path(entry)
+        if entry.codec == 'opus' and path.suffix.lower() in ('.ogg', '.opus') and abs(gain or 0.0) < LOUDNESS_MIN_GAIN:
+            return path
+        return None
+    
+    def loaded_clip(self, song):
+        """Return the in-memory clip of a local song, if it is preloaded and up to date."""
+        if self.clip_cache is None or not song.number:
+            return None
+        entry = self.library.get(song.number)
+        if entry is None or not self.is_clip(entry):
+            return None
+        source = self.clip_file(entry)
+        if source is None:
+            return None
+        clip = self.clip_cache.get(entry, source)
+        if clip is None:
+            # Loaded for next time; it may push out the least recently played clip
+            self.load_clips([(entry, source)])
+        return clip
+    
+    def preload_clips(self):
+        """Load clips that are not in memory yet, as long as they fit without evicting others."""
+        if self.clip_cache is None:
+            return
+        self.clip_cache.prune({entry.path for entry in self.library})
+        pending = []
+        for entry in self.library:
+            if not self.is_clip(entry):
+                continue
+            source = self.clip_file(entry)
+            if source is not None and not self.clip_cache.contains(entry, source) and self.clip_cache.fits(source):
+                pending.append((entry, source))
+        if pending:
+            self.load_clips(pending)
+    
+    def load_clips(self, pending):
+        if self.clip_task is not None and not self.clip_task.done():
+            return  # the next library scan picks up whatever is still missing
+        
+        async def load():
+            loop = asyncio.get_running_loop()
+            for entry, source in pending:
+                try:
+                    await loop.run_in_executor(None, self.clip_cache.load, entry, source)
+                except Exception as e:
+                    logger.warning(f'Could not preload {entry.path}: {e}')
+            logger.info(f'{len(self.clip_cache)} clip(s) in memory, {self.clip_cache.size / 1024:.0f} KiB')
+        
+        self.clip_task = asyncio.create_task(load())
+    
+    def library_gain(self, entry):
+        """Loudness gain (dB) for a library entry, or None (queued for measuring) if not measured yet."""
+        if self.loudness is None:
+            return 0.0
+        key = f'file:{entry.path}'
+        gain = self.loudness.gain(key, entry.mtime, entry.size)
+        if gain is None:
+            self.loudness.enqueue(key, self.library.absolute_path(entry), entry.mtime, entry.size)
+        return gain
+    
+    def track_gain(self, song):
+        """Volume gain (dB) to play a song with; 0 until it has been measured.
         
+        Local songs and remote tracks in the track cache are measured; streamed
+        tracks are played as they are.
+        """
+        if self.loudness is None:
+            return 0.0
+        if song.is_local:
+            entry = self.library.get(song.number) if song.number else None
+            gain = self.library_gain(entry) if entry is not None else None
+        elif song.cached_file:
+            try:
+                stat = os.stat(song.cached_file)
+            except OSError:
+                return 0.0
+            key = f'track:{song.id}'
+            gain = self.loudness.gain(key, stat.st_mtime_ns, stat.st_size)
+            if gain is None:
+                self.loudness.enqueue(key, song.cached_file, stat.st_mtime_ns, stat.st_size)
+        else:
+            return 0.0
+        return gain or 0.0
+    
+    def create_source(self, song, player=None, start_at=0):
+        """Build the audio source for a song, wrapped for prewarming and gap tracking.
+        
+        start_at (seconds) starts playback part way into the track.
+        """
+        spawn_started = time.perf_counter()
+        clip = self.loaded_clip(song) if song.is_local else None
+        cached = self.cached_opus_path(song) if song.is_local and clip is None else None
+        gain = self.track_gain(song) if clip is None and cached is None else 0.0
+        if song.codec == 'opus' and abs(gain) < LOUDNESS_MIN_GAIN:
+            gain = 0.0  # not worth giving up passthrough for
+        if clip is not None:
+            # Soundboard clip already in memory
+            original, path = ClipSource(clip, int(start_at * FRAMES_PER_SECOND)), PATH_CLIP
+        elif cached is not None:
+            # Normalized when it was transcoded
+            original, path = OggOpusSource(cached, int(start_at * FRAMES_PER_SECOND)), PATH_OPUS_CACHE
+        else:
+            if song.cached_file:
+                # Popular remote track already on disk, play it like a local file
+                url, options = song.cached_file, FFMPEG_LOCAL_OPTIONS
+            else:
+                # Choose FFmpeg options based on source
+                url, options = song.url, FFMPEG_LOCAL_OPTIONS if song.is_local else FFMPEG_OPTIONS
+            
+            def open_source(offset=0):
+                return open_ffmpeg_source(
+                    url, song.codec, PLAYBACK_MODE, start_at=start_at + offset, gain=gain, **options
+                )
+            
+            if self.fanout is not None:
+                # Same track from the same position in another guild: share its pipeline
+                key = (song.id or song.url, round(start_at, 2), gain)
+                original, path, shared = self.fanout.open(key, open_source)
+                if shared:
+                    path = PATH_SHARED
+            else:
+                original, path = open_source()
+            if JITTER_BUFFER_SECONDS > 0:
+                depth = max(1, int(JITTER_BUFFER_SECONDS * FRAMES_PER_SECOND))
+                original = JitterBuffer(original, depth, player.buffer_stats if player is not None else None)
+        
+        song.playback_path = path
+        self.playback_paths[path] += 1
+        if path != PATH_SHARED:
+            self.ffmpeg_spawn_seconds.observe(time.perf_counter() - spawn_started, path=path)
+            self.ffmpeg_spawns.inc(path=path)
+        logger.info(f'Playing {song.title} via {path} (codec: {song.codec or "unknown"}, gain: {gain:+.1f} dB)')
+        
+        on_first_frame = None
+        if player is not None:
+            def on_first_frame(started_at):
+                # Runs on the audio thread
+                self.record_gap(player, started_at)
+                trace, player.trace = player.trace, None
+                if trace is not None:
+                    trace.mark('first_packet')
+                    self.bot.loop.call_soon_threadsafe(trace.finish)
+        source = PrewarmedSource(original, on_first_frame)
+        self.sources.add(source)
+        return source
+    
+    def record_gap(self, player, started_at):
+        """Record the silence between the end of a track and the next one's first frame."""
+        ended_at, player.track_ended_at = player.track_ended_at, None
+        if ended_at is not None:
+            player.last_gap = started_at - ended_at
+            self.gaps.append(player.last_gap)
+            self.gap_seconds.observe(player.last_gap)
+    
+    async def prefetch_next(self, player, guild_id, delay):
+        """Resolve the next song's stream URL and prewarm its FFmpeg pipeline."""
+        song = player.peek()
         if song is None:
             return
         
+        try:
+            await self.prepare_song(song, guild_id)
+            
+            # Resolve a few lazily enqueued playlist entries ahead of time
+            for upcoming in player.upcoming(PLAYLIST_RESOLVE_AHEAD + 1):
+                if upcoming is not song and not upcoming.url:
+                    await self.prepare_song(upcoming, guild_id)
+            
+            if not PREWARM_ENABLED:
+                return
+            
+            # Prewarm close to the end so the stream connection is not left idle
+            await asyncio.sleep(delay)
+            if player.peek() is not song:
+                return
+            
+            source = self.create_source(song, player)
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, source.prewarm, PREWARM_SECONDS * FRAMES_PER_SECOND)
+            except BaseException:
+                source.cleanup()
+                raise
+            if source.closed:
+                return  # reaped while prewarming
+            
+            player.take_prefetched(None)
+            player.prefetched = (song, source)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f'Prefetch of {song.title} failed: {e}')
+    
+    def is_idle(self, voice_client, player):
+        """True when nothing is playing, paused or being started, so a new song should be started."""
+        if voice_client is None or voice_client.is_playing() or voice_client.is_paused():
+            return False
+        return not player.start_lock.locked()
+    
+    async def play_next(self, ctx, start_at=0, trace=None, replay=False):
+        """Play the next song in the queue, optionally start_at seconds into it.
+        
+        With ``replay`` (or a pending seek) the current song is played again
+        instead. A metrics trace passed in is finished when the first packet
+        is sent.
+        
+        Track starts are serialized per guild: resolving a song takes a
+        while, and a second !play or button press meanwhile must not start
+        another one. A call that waited for the lock returns if audio started.
+        """
+        player = self.get_player(ctx.guild.id)
+        async with player.start_lock:
+            await self.start_next(ctx, player, start_at, trace, replay)
+    
+    async def start_next(self, ctx, player, start_at, trace, replay):
+        player.text_channel_id = ctx.channel.id
         voice_client = ctx.guild.voice_client
-        if voice_client is None or not voice_client.is_connected():
+        if voice_client is not None and (voice_client.is_playing() or voice_client.is_paused()) and not replay:
+            # Another call started a track while this one waited for the lock
+            if trace is not None:
+                trace.finish()
             return
+        if player.prefetch_task is not None:
+            player.prefetch_task.cancel()
+            player.prefetch_task = None
         
-        # Choose FFmpeg options based on source
-        if song.get('is_local'):
-            source = discord.FFmpegPCMAudio(song['url'], **FFMPEG_LOCAL_OPTIONS)
-        else:
-            source = discord.FFmpegPCMAudio(song['url'], **FFMPEG_OPTIONS)
+        restart_at, player.restart_at = player.restart_at, None
+        if voice_client is None or not voice_client.is_connected() or player.leaving:
+            # Disconnected mid-track (kicked, connection lost, reaped): keep the
+            # current song and its position, so !resume continues where it stopped
+            player.restart_at = restart_at
+            player.track_ended_at = None
+            player.take_prefetched(None)
+            if trace is not None:
+                trace.finish()
+            return
+        
+        if restart_at is not None:
+            replay, start_at = True, restart_at
+        previous = player.current
+        skipped = 0
+        while True:
+            if replay:
+                song = player.current
+            else:
+                song = player.next()
+                player.stream_retries = 0
+            if song is None:
+                break
+            
+            # A prewarmed source starts at 0 s, so it is no use for a mid-track start
+            had_prefetch = player.prefetched is not None
+            source = player.take_prefetched(None if start_at else song)
+            if source is not None:
+                break
+            if had_prefetch or start_at:
+                self.ffmpeg_restarts.inc()
+            try:
+                await self.prepare_song(song, ctx.guild.id)
+            except Exception as e:
+                logger.warning(f'Could not prepare {song.title}: {e}')
+            if trace is not None:
+                trace.mark('prepare')
+            if song.url or song.cached_file:
+                source = self.create_source(song, player, start_at)
+                if trace is not None:
+                    trace.mark('ffmpeg_spawn')
+                break
+            # Lazily enqueued entry that could not be resolved (removed, private...)
+            skipped += 1
+            player.current = None
+            replay, start_at, restart_at = False, 0, None
+        
+        if song is None:
+            player.track_ended_at = None
+            player.take_prefetched(None)
+            if trace is not None:
+                trace.finish()
+            await self.report_skipped(ctx, skipped)
+            return
+        # Seeks, resumes, stream recoveries and loop repeats are not new plays
+        new_play = not replay and not start_at and song is not previous
+        
+        if trace is not None:
+            player.trace = trace
         
         def after_playing(error):
+            player.track_ended_at = time.perf_counter()
             if error:
-                print(f'Player error: {error}')
+                self.playback_errors.inc()
+                logger.warning(f'Player error in {song.title}: {error}')
+            if self.stream_cut_off(player, song, source):
+                asyncio.run_coroutine_threadsafe(self.recover_stream(ctx, song, player.position), self.bot.loop)
+                return
             # Schedule next song
             asyncio.run_coroutine_threadsafe(self.play_next(ctx), self.bot.loop)
         
-        voice_client.play(source, after=after_playing)
+        try:
+            voice_client.play(source, after=after_playing)
+        except discord.ClientException as e:
+            # Something else is playing (or the connection just went): keep the song for later
+            logger.warning(f'Could not start {song.title}: {e}')
+            source.cleanup()
+            if song is not previous:
+                player.queue.insert(0, song)
+                player.current = previous
+            if trace is not None:
+                trace.finish()
+            player.trace = None
+            return
+        player.source, player.start_offset = source, start_at
+        
+        if self.track_cache is not None and not song.is_local and new_play:
+            if self.track_cache.record_play(song.id, hit=song.cached_file is not None):
+                self.spawn(self.track_cache.download(song.id, song.webpage_url))
+        
+        delay = max(0, song.duration - start_at - PREWARM_LEAD)
+        player.prefetch_task = asyncio.create_task(self.prefetch_next(player, ctx.guild.id, delay))
+        await self.report_skipped(ctx, skipped)
         
-        # Send now playing with controls
-        await self.send_now_playing(ctx, song)
+        # Send now playing with controls (a seek keeps the message already shown)
+        if restart_at is None or player.now_playing_message is None:
+            await self.send_now_playing(ctx, song)
+    
+    async def report_skipped(self, ctx, skipped):
+        """One message for all the queued entries that could not be resolved."""
+        if skipped:
+            plural = 's' if skipped > 1 else ''
+            await ctx.channel.send(f'❌ Skipped **{skipped}** song{plural} that could not be loaded', delete_after=10)
+    
+    def stream_cut_off(self, player, song, source):
+        """True when a remote stream ended well before the end of its track."""
+        if not source.ended or song.is_local or song.cached_file or not song.duration:
+            return False
+        if player.current is not song or player.stream_retries >= STREAM_RETRIES:
+            return False
+        return player.position < song.duration - STREAM_END_TOLERANCE
+    
+    async def recover_stream(self, ctx, song, position):
+        """Re-resolve a cut off stream's URL and continue the track where it stopped."""
+        player = self.get_player(ctx.guild.id)
+        player.stream_retries += 1
+        self.stream_recoveries.inc()
+        logger.warning(f'Stream of {song.title} ended at {format_duration(position)}, re-resolving its URL')
+        # Stale or refused URL: the next prepare_song() resolves a new one
+        self.extract_cache.expire(song.webpage_url)
+        song.url = None
+        player.restart_at = position
+        await self.play_next(ctx)
     
     async def connect_to_voice(self, ctx, member=None) -> bool:
         """Try to connect to voice channel with error handling.
@@ -251,99 +1356,127 @@ class Music(commands.Cog):
             await send_func(f'❌ Connection error: {str(e)}')
             return False
     
-    @commands.Cog.listener()
-    async def on_reaction_add(self, reaction: discord.Reaction, user: discord.User):
-        """Handle reaction controls on now playing messages."""
-        # Ignore bot's own reactions
-        if user.bot:
-            return
-        
-        # Check if this reaction is on a now playing message
-        guild = reaction.message.guild
-        if guild is None:
-            return
-        
+    async def handle_control(self, interaction: discord.Interaction, action):
+        """Run a now playing button action, timed from the button press to the response."""
+        trace = self.metrics.trace(f'control:{action}', interaction.guild.id, interaction.created_at.timestamp())
+        try:
+            await self.run_control(interaction, action)
+        finally:
+            trace.mark('respond')
+            trace.finish()
+    
+    async def run_control(self, interaction: discord.Interaction, action):
+        """Run a now playing button action and report it on the message itself."""
+        guild = interaction.guild
         player = self.get_player(guild.id)
-        if player.now_playing_message is None:
-            return
-        if reaction.message.id != player.now_playing_message.id:
-            return
-        
         voice_client = guild.voice_client
-        emoji = str(reaction.emoji)
         
-        # Remove user's reaction
-        try:
-            await reaction.remove(user)
-        except discord.HTTPException:
-            pass
+        if action == 'queue':
+            if not player.queue and not player.current:
+                return await interaction.response.send_message('📭 Queue is empty!', ephemeral=True)
+            return await interaction.response.send_message(embed=self.build_queue_embed(player), ephemeral=True)
+        
+        # Joining voice or starting a song can take longer than the 3 s interaction deadline
+        deferred = action == 'ninja' or (
+            action == 'resume' and (voice_client is None or not voice_client.is_connected())
+        )
+        if deferred:
+            await interaction.response.defer()
         
-        if emoji == EMOJI_PAUSE:
+        status, ok = None, True
+        if action == 'pause':
             if voice_client and voice_client.is_playing():
                 voice_client.pause()
-                await reaction.message.channel.send('⏸️ Paused', delete_after=3)
+                status = f'⏸️ Paused by {interaction.user.mention}'
+            else:
+                status, ok = '❌ Nothing is playing!', False
         
-        elif emoji == EMOJI_RESUME:
+        elif action == 'resume':
             if voice_client and voice_client.is_paused():
                 voice_client.resume()
-                await reaction.message.channel.send('▶️ Resumed', delete_after=3)
+                status = f'▶️ Resumed by {interaction.user.mention}'
             elif voice_client is None or not voice_client.is_connected():
                 # Bot is not in channel, join and play current
-                if await self.connect_to_voice(reaction.message, user):
-                    if player.current:
-                        await self.play_next(reaction.message)
-                        await reaction.message.channel.send('▶️ Joining and resuming', delete_after=3)
-                    else:
-                        await reaction.message.channel.send('❌ Nothing to resume!', delete_after=3)
+                if not await self.connect_to_voice(interaction, interaction.user):
+                    return
+                if player.current:
+                    await self.play_next(interaction, start_at=player.position, replay=True)
+                    status = '▶️ Joining and resuming'
+                else:
+                    status, ok = '❌ Nothing to resume!', False
             else:
-                await reaction.message.channel.send('❌ Nothing is paused!', delete_after=3)
+                status, ok = '❌ Nothing is paused!', False
         
-        elif emoji == EMOJI_SKIP:
+        elif action == 'skip':
             if voice_client and voice_client.is_playing():
                 voice_client.stop()  # Triggers play_next
-                await reaction.message.channel.send('⏭️ Skipped', delete_after=3)
+                status = f'⏭️ Skipped by {interaction.user.mention}'
+            else:
+                status, ok = '❌ Nothing is playing!', False
         
-        elif emoji == EMOJI_STOP:
+        elif action == 'stop':
             if voice_client:
                 player.clear()
                 voice_client.stop()
-                await reaction.message.channel.send('⏹️ Stopped', delete_after=3)
-        
-        elif emoji == EMOJI_QUEUE:
-            # Show queue
-            if not player.queue and not player.current:
-                await reaction.message.channel.send('📭 Queue is empty!', delete_after=5)
+                status = f'⏹️ Stopped by {interaction.user.mention}'
             else:
-                embed = discord.Embed(title='🎵 Music Queue', color=discord.Color.blurple())
-                if player.current:
-                    embed.add_field(name='Now Playing', value=f'**{player.current["title"]}**', inline=False)
-                if player.queue:
-                    queue_list = '\n'.join(f'{i+1}. {song["title"]}' for i, song in enumerate(list(player.queue)[:10]))
-                    if len(player.queue) > 10:
-                        queue_list += f'\n... and {len(player.queue) - 10} more'
-                    embed.add_field(name='Up Next', value=queue_list, inline=False)
-                await reaction.message.channel.send(embed=embed, delete_after=15)
-        
-        elif emoji == EMOJI_NINJA:
+                status, ok = '❌ I\'m not in a voice channel!', False
+        
+        elif action == 'ninja':
             # Play song #2 from local folder
             try:
                 # Ensure joined first
                 if voice_client is None or not voice_client.is_connected():
-                    if not await self.connect_to_voice(reaction.message, user):
+                    if not await self.connect_to_voice(interaction, interaction.user):
                         return
                     # Refresh voice_client after connecting
                     voice_client = guild.voice_client
-
+                
                 song = self.get_local_song_info(2)
                 player.add(song)
                 
-                if voice_client and not voice_client.is_playing() and not voice_client.is_paused():
-                    await reaction.message.channel.send('🥷 Playing **#2**', delete_after=3)
-                    await self.play_next(reaction.message)
+                if self.is_idle(voice_client, player):
+                    status = '🥷 Playing **#2**'
+                    await self.play_next(interaction)
                 else:
-                    await reaction.message.channel.send('🥷 Added **#2** to queue', delete_after=3)
+                    status = '🥷 Added **#2** to queue'
             except Exception as e:
-                await reaction.message.channel.send(f'❌ {str(e)}', delete_after=5)
+                status, ok = f'❌ {str(e)}', False
+        
+        await self.report_status(interaction, status, ok, deferred)
+    
+    async def report_status(self, interaction, status, ok, deferred):
+        """Show a control's outcome in the Status field of the current now playing message.
+        
+        Errors, and actions on outdated now playing messages, get an ephemeral
+        reply instead.
+        """
+        player = self.get_player(interaction.guild.id)
+        message = interaction.message
+        is_current = (
+            ok and message is not None and message.embeds
+            and player.now_playing_message is not None
+            and message.id == player.now_playing_message.id
+        )
+        
+        if not is_current:
+            if deferred:
+                await interaction.followup.send(status, ephemeral=True)
+            else:
+                await interaction.response.send_message(status, ephemeral=True)
+            return
+        
+        embed = message.embeds[0]
+        index = next((i for i, field in enumerate(embed.fields) if field.name == 'Status'), None)
+        if index is None:
+            embed.add_field(name='Status', value=status, inline=False)
+        else:
+            embed.set_field_at(index, name='Status', value=status, inline=False)
+        
+        if deferred:
+            await interaction.edit_original_response(embed=embed)
+        else:
+            await interaction.response.edit_message(embed=embed)
     
     @commands.hybrid_command(name='join', description='Join your voice channel')
     async def join(self, ctx: commands.Context):
@@ -374,11 +1507,19 @@ class Music(commands.Cog):
         - !play 5          (plays fifth local song)
         - !play https://youtube.com/watch?v=...
         - !play never gonna give you up
+        - !play https://youtube.com/playlist?list=...
         """
+        created_at = ctx.interaction.created_at if ctx.interaction else ctx.message.created_at
+        trace = self.metrics.trace('play', ctx.guild.id, created_at.timestamp())
+        
         # Auto-join if not in voice channel
         if ctx.guild.voice_client is None:
             if not await self.connect_to_voice(ctx):
                 return
+            trace.mark('voice_connect')
+        
+        if is_playlist_url(query):
+            return await self.enqueue_playlist(ctx, query)
         
         try:
             # Check if query is a number (local song)
@@ -386,9 +1527,15 @@ class Music(commands.Cog):
                 song_number = int(query)
                 song = self.get_local_song_info(song_number)
                 await ctx.send(f'📁 Playing **#{song_number}**')
+            elif self.suggested_track(query) is not None:
+                # Picked from the autocomplete list: enqueue right away, the
+                # stream URL is resolved (or served from cache) before it plays,
+                # under the guild's start lock, so a second /play meanwhile only queues
+                song = Song.from_info(self.suggested_track(query))
             else:
                 await ctx.send(f'🔍 Searching for: **{query}**')
-                song = await self.extract_info(query)
+                song = Song.from_info(await self.extract_info(query, ctx.guild.id))
+            trace.mark('extract')
         except Exception as e:
             return await ctx.send(f'❌ {str(e)}')
         
@@ -397,20 +1544,152 @@ class Music(commands.Cog):
         
         # If not currently playing, start playing
         voice_client = ctx.guild.voice_client
-        if voice_client and not voice_client.is_playing() and not voice_client.is_paused():
-            await self.play_next(ctx)
+        if self.is_idle(voice_client, player):
+            await self.play_next(ctx, trace=trace)
         else:
-            await ctx.send(f'📝 Added to queue: **{song["title"]}**')
+            trace.finish()
+            await ctx.send(f'📝 Added to queue: **{song.title}**')
+    
+    @play.autocomplete('query')
+    async def play_autocomplete(self, interaction: discord.Interaction, current: str):
+        """Suggest local songs and YouTube tracks while the query is typed."""
+        started = time.perf_counter()
+        current = current.strip()
+        if not current or current.startswith(('http://', 'https://')):
+            return []
+        if current.isdigit():
+            entry = self.library.get(int(current))
+            label = self.library_titles.label(entry.number) if entry is not None else None
+            return [app_commands.Choice(name=label, value=current)] if label else []
+        
+        suggestions = self.library_titles.search(current, LIBRARY_SUGGESTIONS)
+        suggestions += [
+            (f'▶️ {info["title"]}', info['webpage_url'])
+            for _, info in self.resolved_titles.search(current, RESOLVED_SUGGESTIONS)
+        ]
+        result = 'local'
+        if AUTOCOMPLETE_REMOTE and len(current) >= AUTOCOMPLETE_MIN_CHARS:
+            found = await self.search_suggestions(current, interaction.user.id)
+            if found is None:
+                result = 'timeout'
+            else:
+                result = 'remote'
+                suggestions += [(f'🔍 {info["title"]}', info['webpage_url']) for info in found]
+        
+        choices, seen = [], set()
+        for name, value in suggestions:
+            if value in seen or len(value) > 100:
+                continue
+            seen.add(value)
+            choices.append(app_commands.Choice(name=name[:100], value=value))
+        self.autocomplete_seconds.observe(time.perf_counter() - started, result=result)
+        return choices[:25]
+    
+    async def search_suggestions(self, query, user_id):
+        """Flat YouTube search results for autocomplete, cached and throttled per user.
+        
+        Returns None when the search did not finish within AUTOCOMPLETE_TIMEOUT;
+        it keeps running and fills the cache for the next keystroke.
+        """
+        key = normalize_query(query)
+        now = time.monotonic()
+        cached = self.search_cache.get(key)
+        if cached is not None and cached[0] > now:
+            self.search_cache.move_to_end(key)
+            return cached[1]
+        
+        task = self.search_tasks.get(key)
+        if task is None:
+            if now - self.search_throttle.get(user_id, 0) < AUTOCOMPLETE_THROTTLE:
+                return []
+            self.search_throttle[user_id] = now
+            if len(self.search_throttle) > 1000:
+                self.search_throttle = {
+                    user: at for user, at in self.search_throttle.items() if now - at < AUTOCOMPLETE_THROTTLE
+                }
+            task = self.search_tasks[key] = asyncio.create_task(self.run_search(key, query))
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), AUTOCOMPLETE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+    
+    async def run_search(self, key, query):
+        try:
+            # All autocomplete searches share one round-robin slot, so typing never
+            # holds up the extractions of songs that are about to play
+            found = (await self.extractor.search(query, 'autocomplete'))['entries']
+        except Exception as e:
+            logger.debug(f'Autocomplete search failed: {e}')
+            found = []
+        finally:
+            self.search_tasks.pop(key, None)
+        self.search_cache[key] = (time.monotonic() + AUTOCOMPLETE_CACHE_TTL, found)
+        while len(self.search_cache) > SEARCH_CACHE_MAX:
+            self.search_cache.popitem(last=False)
+        for info in found:
+            self.remember_title(info)
+        return found
+    
+    def remember_title(self, info):
+        """Make a resolved or found YouTube track searchable for autocomplete."""
+        if info.get('is_local') or not info.get('id') or not info.get('webpage_url'):
+            return
+        # Metadata only; the stream URL is looked up again when the track is played
+        self.resolved_titles.add(info['id'], info['title'], dict(info, url=None))
+    
+    def suggested_track(self, query):
+        """Return the track behind an autocomplete choice, if the query is one."""
+        key = normalize_query(query)
+        if not key.startswith('id:'):
+            return None
+        return self.resolved_titles.get(key[3:])
+    
+    def index_library_titles(self):
+        """Bring the autocomplete index in line with the library (new files, probed tags)."""
+        numbers = set()
+        for entry in self.library:
+            numbers.add(entry.number)
+            name = os.path.splitext(os.path.basename(entry.path))[0]
+            title = f'{entry.artist} - {entry.title}' if entry.artist and entry.title else entry.title or name
+            label = f'📁 #{entry.number} {title}'
+            if self.library_titles.label(entry.number) != label:
+                self.library_titles.add(entry.number, f'{title} {name}', str(entry.number), label)
+        for number in self.library_titles.keys():
+            if number not in numbers:
+                self.library_titles.remove(number)
+    
+    async def enqueue_playlist(self, ctx, url):
+        """Enqueue every entry of a playlist; stream URLs are resolved lazily later."""
+        await ctx.send('📃 Loading playlist...')
+        try:
+            playlist = await self.extractor.extract_playlist(url, ctx.guild.id)
+        except Exception as e:
+            return await ctx.send(f'❌ Failed to load playlist: {str(e)}')
+        
+        if not playlist['entries']:
+            return await ctx.send('❌ Playlist is empty')
+        
+        player = self.get_player(ctx.guild.id)
+        player.queue.extend(Song.from_info(entry) for entry in playlist['entries'])
+        await ctx.send(f'📝 Added **{len(playlist["entries"])}** songs from **{playlist["title"]}**')
+        
+        voice_client = ctx.guild.voice_client
+        if self.is_idle(voice_client, player):
+            await self.play_next(ctx)
     
     @commands.hybrid_command(name='songs', description='Show number of available local songs', aliases=['list', 'local'])
     async def songs(self, ctx: commands.Context):
         """Show the number of available local songs."""
-        songs = get_local_songs()
+        count = len(self.library)
         
-        if not songs:
+        if not count:
             return await ctx.send('📭 No audio files found')
         
-        await ctx.send(f'📁 **{len(songs)}** songs available. Use `/play 1` to `/play {len(songs)}` to play.')
+        gaps = ' (numbers of removed songs are not reused)' if count < self.library.max_number else ''
+        await ctx.send(
+            f'📁 **{count}** songs available, numbered up to #{self.library.max_number}{gaps}. '
+            f'Use `/play <number>` to play one.'
+        )
     
     @commands.hybrid_command(name='pause', description='Pause the current song')
     async def pause(self, ctx: commands.Context):
@@ -435,13 +1714,33 @@ class Music(commands.Cog):
             if await self.connect_to_voice(ctx):
                 player = self.get_player(ctx.guild.id)
                 if player.current:
-                    await self.play_next(ctx)
-                    await ctx.send('▶️ Joining and resuming')
+                    await self.play_next(ctx, start_at=player.position, replay=True)
+                    await ctx.send(f'▶️ Joining and resuming at **{format_duration(player.position)}**')
                 else:
                     await ctx.send('❌ Nothing to resume!')
         else:
             await ctx.send('❌ Nothing is paused!')
     
+    @commands.hybrid_command(name='seek', description='Jump to a position in the current song')
+    @app_commands.describe(position='Seconds, m:ss or h:mm:ss; +/- to seek relative to now')
+    async def seek(self, ctx: commands.Context, position: str):
+        """Restart the current song at another position."""
+        voice_client = ctx.guild.voice_client
+        player = self.get_player(ctx.guild.id)
+        if voice_client is None or player.current is None or not (voice_client.is_playing() or voice_client.is_paused()):
+            return await ctx.send('❌ Nothing is playing!')
+        
+        seconds = parse_position(position, player.position)
+        if seconds is None:
+            return await ctx.send('❌ Use seconds, m:ss or h:mm:ss (e.g. `1:30` or `+30`)')
+        if player.current.duration and seconds >= player.current.duration:
+            return await ctx.send(f'❌ The song is only {format_duration(player.current.duration)} long')
+        
+        # The stream URL is reused while it is valid; FFmpeg seeks the input with -ss
+        player.restart_at = seconds
+        voice_client.stop()  # Triggers play_next, which restarts the song at restart_at
+        await ctx.send(f'⏩ Seeked to **{format_duration(seconds)}**')
+    
     @commands.hybrid_command(name='stop', description='Stop playback and clear queue')
     async def stop(self, ctx: commands.Context):
         """Stop playback and clear the queue."""
@@ -465,35 +1764,49 @@ class Music(commands.Cog):
         await ctx.send('⏭️ Skipped')
     
     @commands.hybrid_command(name='queue', description='Show the current queue', aliases=['q'])
-    async def queue(self, ctx: commands.Context):
-        """Show the current queue."""
+    @app_commands.describe(page='Page of the queue to show')
+    async def queue(self, ctx: commands.Context, page: int = 1):
+        """Show the current queue, ten songs per page."""
         player = self.get_player(ctx.guild.id)
         
         if not player.queue and not player.current:
             return await ctx.send('📭 Queue is empty!')
         
-        embed = discord.Embed(title='🎵 Music Queue', color=discord.Color.blurple())
+        embed = self.build_queue_embed(player, page)
+        await ctx.send(embed=embed)
+    
+    @commands.hybrid_command(name='remove', description='Remove a song from the queue', aliases=['rm'])
+    @app_commands.describe(position='Position in the queue (as shown by /queue)')
+    async def remove(self, ctx: commands.Context, position: int):
+        """Remove the song at a queue position."""
+        player = self.get_player(ctx.guild.id)
+        if not 1 <= position <= len(player.queue):
+            return await ctx.send(f'❌ Invalid position. Choose 1-{len(player.queue)}')
         
-        if player.current:
-            source = '📁' if player.current.get('is_local') else '🌐'
-            embed.add_field(
-                name='Now Playing',
-                value=f'{source} **{player.current["title"]}**',
-                inline=False
-            )
+        song = player.queue.pop(position - 1)
+        await ctx.send(f'🗑️ Removed **{song.title}**')
+    
+    @commands.hybrid_command(name='move', description='Move a song to another queue position', aliases=['mv'])
+    @app_commands.describe(source='Current position', destination='New position')
+    async def move(self, ctx: commands.Context, source: int, destination: int):
+        """Move a song within the queue."""
+        player = self.get_player(ctx.guild.id)
+        count = len(player.queue)
+        if not (1 <= source <= count and 1 <= destination <= count):
+            return await ctx.send(f'❌ Invalid position. Choose 1-{count}')
         
-        if player.queue:
-            queue_list = '\n'.join(
-                f'{i+1}. {"📁" if song.get("is_local") else "🌐"} {song["title"]}'
-                for i, song in enumerate(list(player.queue)[:10])
-            )
-            remaining = len(player.queue) - 10
-            if remaining > 0:
-                queue_list += f'\n... and {remaining} more'
-            embed.add_field(name='Up Next', value=queue_list, inline=False)
+        song = player.queue.move(source - 1, destination - 1)
+        await ctx.send(f'↕️ Moved **{song.title}** to position {destination}')
+    
+    @commands.hybrid_command(name='shuffle', description='Shuffle the queue')
+    async def shuffle(self, ctx: commands.Context):
+        """Shuffle the queued songs."""
+        player = self.get_player(ctx.guild.id)
+        if not player.queue:
+            return await ctx.send('📭 Queue is empty!')
         
-        embed.set_footer(text=f'Total in queue: {len(player.queue)} song(s)')
-        await ctx.send(embed=embed)
+        player.queue.shuffle()
+        await ctx.send(f'🔀 Shuffled {len(player.queue)} song(s)')
     
     @commands.hybrid_command(name='nowplaying', description='Show the current song', aliases=['np', 'current'])
     async def nowplaying(self, ctx: commands.Context):
@@ -505,6 +1818,112 @@ class Music(commands.Cog):
         
         await self.send_now_playing(ctx, player.current)
     
+    @commands.hybrid_command(name='stats', description='Show cache statistics (bot owner only)')
+    @commands.is_owner()
+    async def stats(self, ctx: commands.Context):
+        """Show extraction cache, worker and playback statistics.
+        
+        Owner only: the embed covers every guild and shows cache paths and
+        process details.
+        """
+        stats = self.extract_cache.stats()
+        extractor = self.extractor.stats()
+        
+        embed = discord.Embed(title='📊 Cache Statistics', color=discord.Color.blurple())
+        embed.add_field(
+            name='Extraction Cache',
+            value=(
+                f'{stats["entries"]} entries, {stats["bytes"] / 1024:.0f} / {stats["max_bytes"] / 1024:.0f} KiB\n'
+                f'Hits: {stats["hits"]} | Shared: {stats["shared_hits"]} | Misses: {stats["misses"]} | '
+                f'URL refreshes: {stats["refreshes"]}\n'
+                f'Evictions: {stats["evictions"]} | Hit rate: {stats["hit_rate"]:.0%}'
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name=f'Extraction Workers ({extractor["backend"]})',
+            value=(
+                f'Running: {extractor["running"]}/{extractor["workers"]} | Queued: {extractor["queued"]} | '
+                f'Restarts: {extractor["restarts"]}\n'
+                f'Completed: {extractor["completed"]} | Failed: {extractor["failed"]} | '
+                f'Coalesced: {extractor["coalesced"]}'
+            ),
+            inline=False
+        )
+        if self.opus_cache is not None:
+            opus = self.opus_cache.stats()
+            embed.add_field(
+                name='Opus Cache',
+                value=(
+                    f'{opus["files"]}/{len(self.library)} local songs cached | '
+                    f'Transcoded: {opus["transcoded"]} | Failed: {opus["failed"]}'
+                ),
+                inline=False
+            )
+        if self.clip_cache is not None:
+            clips = self.clip_cache.stats()
+            embed.add_field(
+                name='Clip Cache',
+                value=(
+                    f'{clips["clips"]} clips, {clips["bytes"] / 1024 / 1024:.1f} / '
+                    f'{clips["max_bytes"] / 1024 / 1024:.0f} MiB\n'
+                    f'Plays: {clips["hits"]} | Loads: {clips["loads"]} | Evictions: {clips["evictions"]}'
+                ),
+                inline=False
+            )
+        if self.track_cache is not None:
+            tracks = self.track_cache.stats()
+            embed.add_field(
+                name='Track Cache',
+                value=(
+                    f'{tracks["files"]} files, {tracks["bytes"] / 1024 / 1024:.0f} / '
+                    f'{tracks["max_bytes"] / 1024 / 1024:.0f} MiB\n'
+                    f'Hits: {tracks["hits"]} | Misses: {tracks["misses"]} | Hit rate: {tracks["hit_rate"]:.0%}\n'
+                    f'Downloads: {tracks["downloads"]} | Evictions: {tracks["evictions"]}'
+                ),
+                inline=False
+            )
+        if self.loudness is not None:
+            loudness = self.loudness.stats()
+            embed.add_field(
+                name='Loudness Normalization',
+                value=(
+                    f'{loudness["tracks"]} tracks measured | Queued: {loudness["queued"]} | '
+                    f'Failed: {loudness["failed"]} | Target: {LOUDNESS_TARGET:g} LUFS'
+                ),
+                inline=False
+            )
+        player = self.players.get(ctx.guild.id)
+        if JITTER_BUFFER_SECONDS > 0 and player is not None:
+            buffer = player.buffer_stats
+            embed.add_field(
+                name='Jitter Buffer (this server)',
+                value=(
+                    f'Fill: {buffer.fill / FRAMES_PER_SECOND:.1f} / {buffer.depth / FRAMES_PER_SECOND:.1f} s | '
+                    f'Underruns: {buffer.underruns}\n'
+                    f'Stalled: {buffer.stall_seconds:.2f} s total, longest {buffer.longest_stall * 1000:.0f} ms'
+                ),
+                inline=False
+            )
+        if self.playback_paths:
+            embed.add_field(
+                name='Playback Paths',
+                value=' | '.join(f'{PATH_LABELS[path]}: {count}' for path, count in self.playback_paths.items()),
+                inline=False
+            )
+        if self.gaps:
+            gaps = sorted(self.gaps)
+            p95 = gaps[min(len(gaps) - 1, int(len(gaps) * 0.95))]
+            embed.add_field(
+                name='Track Transitions',
+                value=(
+                    f'Median gap: {statistics.median(gaps) * 1000:.0f} ms | '
+                    f'p95: {p95 * 1000:.0f} ms ({len(gaps)} transitions)'
+                ),
+                inline=False
+            )
+        await ctx.send(embed=embed)
+    
     @commands.hybrid_command(name='loop', description='Toggle loop mode')
     async def loop(self, ctx: commands.Context):
         """Toggle loop mode for the current song."""
@@ -11,5 +11,157 @@ COMMAND_PREFIX = "!"
 PROJECT_DIR = Path(__file__).parent
 MUSIC_FOLDER = PROJECT_DIR / "music"
 
+# Local library index: song numbers and probed metadata survive restarts.
+# The folder is rescanned every LIBRARY_SCAN_INTERVAL seconds (only changed
+# directories are listed); every LIBRARY_DEEP_SCAN_EVERY scans all files are
+# stat'ed to catch in-place edits.
+LIBRARY_INDEX_FILE = PROJECT_DIR / "library_index.json"
+LIBRARY_SCAN_INTERVAL = int(os.getenv("LIBRARY_SCAN_INTERVAL", 60))
+LIBRARY_DEEP_SCAN_EVERY = int(os.getenv("LIBRARY_DEEP_SCAN_EVERY", 60))
+
+# Extraction cache: resolved yt-dlp results reused across guilds until the
+# stream URL expires. Size is an approximate memory cap in bytes.
+EXTRACT_CACHE_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+# Fallback lifetime (seconds) for stream URLs without an expire= parameter
+EXTRACT_CACHE_DEFAULT_TTL = int(os.getenv("EXTRACT_CACHE_DEFAULT_TTL", 3600))
+# Treat stream URLs as expired this many seconds before their expire= time
+EXTRACT_CACHE_EXPIRY_MARGIN = int(os.getenv("EXTRACT_CACHE_EXPIRY_MARGIN", 300))
+
+# Maximum number of yt-dlp extractions running at once (one warm YoutubeDL each)
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", 4))
+# "thread" runs extractions in threads of this process; "process" runs them in
+# long-lived worker processes so yt-dlp's parsing does not hold the bot's GIL.
+# EXTRACT_TIMEOUT (seconds) is enforced by killing the worker process.
+EXTRACT_BACKEND = os.getenv("EXTRACT_BACKEND", "thread")
+EXTRACT_TIMEOUT = int(os.getenv("EXTRACT_TIMEOUT", 30))
+
+# Playlists are enqueued from a flat extraction (titles only); stream URLs are
+# resolved just before each entry plays, PLAYLIST_RESOLVE_AHEAD entries ahead.
+PLAYLIST_MAX_ENTRIES = int(os.getenv("PLAYLIST_MAX_ENTRIES", 1000))
+PLAYLIST_RESOLVE_AHEAD = int(os.getenv("PLAYLIST_RESOLVE_AHEAD", 2))
+
+# Look-ahead for near-gapless transitions: the next track's stream URL is
+# refreshed as soon as a track starts, and (if enabled) its FFmpeg pipeline is
+# started PREWARM_LEAD seconds before the end with PREWARM_SECONDS buffered.
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "1") == "1"
+PREWARM_SECONDS = int(os.getenv("PREWARM_SECONDS", 3))
+PREWARM_LEAD = int(os.getenv("PREWARM_LEAD", 15))
+
+# "passthrough": copy Opus sources straight through and let FFmpeg encode the
+# rest; "pcm": always decode to PCM and encode in-process (legacy behaviour)
+PLAYBACK_MODE = os.getenv("PLAYBACK_MODE", "passthrough")
+
+# Pre-transcoded Opus copies of the local library, played without FFmpeg.
+# Transcoding runs in OPUS_CACHE_WORKERS processes (0 = one per CPU core).
+OPUS_CACHE_ENABLED = os.getenv("OPUS_CACHE_ENABLED", "1") == "1"
+OPUS_CACHE_DIR = Path(os.getenv("OPUS_CACHE_DIR", PROJECT_DIR / "cache" / "opus"))
+OPUS_CACHE_WORKERS = int(os.getenv("OPUS_CACHE_WORKERS", 0))
+OPUS_CACHE_BITRATE = int(os.getenv("OPUS_CACHE_BITRATE", 128))
+
+# Optional on-disk cache of popular YouTube tracks: a track is downloaded once
+# it has been played TRACK_CACHE_MIN_PLAYS times, least recently played files
+# are evicted past TRACK_CACHE_MAX_BYTES.
+TRACK_CACHE_ENABLED = os.getenv("TRACK_CACHE_ENABLED", "0") == "1"
+TRACK_CACHE_DIR = Path(os.getenv("TRACK_CACHE_DIR", PROJECT_DIR / "cache" / "tracks"))
+TRACK_CACHE_MAX_BYTES = int(os.getenv("TRACK_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+TRACK_CACHE_MIN_PLAYS = int(os.getenv("TRACK_CACHE_MIN_PLAYS", 3))
+
+# Warm restart: player state (queue, current track and position, voice
+# channel) and resolved track metadata are kept in a SQLite database, written
+# every STATE_FLUSH_INTERVAL seconds, and playback resumes where it left off
+# after a restart. Saved metadata unused for STATE_CACHE_MAX_AGE seconds is
+# dropped.
+STATE_ENABLED = os.getenv("STATE_ENABLED", "1") == "1"
+STATE_DB = Path(os.getenv("STATE_DB", PROJECT_DIR / "state.db"))
+STATE_FLUSH_INTERVAL = int(os.getenv("STATE_FLUSH_INTERVAL", 5))
+STATE_CACHE_MAX_AGE = int(os.getenv("STATE_CACHE_MAX_AGE", 7 * 24 * 3600))
+
+# Prometheus-style metrics (stage latencies, failures, voice clients) served on
+# http://METRICS_HOST:METRICS_PORT/metrics. Requests slower than
+# METRICS_SLOW_TRACE_SECONDS get their per-stage trace logged and listed on
+# /traces (0 = off).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+METRICS_SLOW_TRACE_SECONDS = float(os.getenv("METRICS_SLOW_TRACE_SECONDS", 0))
+
+# Slash command sync: "guild" copies the commands to every guild (changes
+# show up instantly), "global" registers them once for all guilds. Either way
+# only what changed since the last sync (hashes in COMMAND_SYNC_FILE) is sent,
+# COMMAND_SYNC_CONCURRENCY guilds at a time.
+COMMAND_SYNC_MODE = os.getenv("COMMAND_SYNC_MODE", "guild")
+COMMAND_SYNC_FILE = PROJECT_DIR / "command_sync.json"
+COMMAND_SYNC_CONCURRENCY = int(os.getenv("COMMAND_SYNC_CONCURRENCY", 4))
+
+# Idle reaper, run every REAPER_INTERVAL seconds: leaves voice channels that
+# have been empty for VOICE_EMPTY_TIMEOUT seconds, or idle (nothing playing)
+# for VOICE_IDLE_TIMEOUT (VOICE_PAUSED_TIMEOUT while paused); the queue and
+# the track position are kept for the next !play or resume. Kills FFmpeg
+# processes no player uses any more, and forgets players that have been
+# disconnected and unused for PLAYER_IDLE_TTL seconds.
+REAPER_INTERVAL = int(os.getenv("REAPER_INTERVAL", 30))
+VOICE_EMPTY_TIMEOUT = int(os.getenv("VOICE_EMPTY_TIMEOUT", 120))
+VOICE_IDLE_TIMEOUT = int(os.getenv("VOICE_IDLE_TIMEOUT", 300))
+VOICE_PAUSED_TIMEOUT = int(os.getenv("VOICE_PAUSED_TIMEOUT", 1800))
+PLAYER_IDLE_TTL = int(os.getenv("PLAYER_IDLE_TTL", 3600))
+
+# Sharding: SHARDING=1 runs an AutoShardedBot. launcher.py starts
+# SHARD_CLUSTERS processes, each running its slice of SHARD_COUNT shards
+# (0 = Discord's recommended count). CLUSTER_ID is set by the launcher;
+# cluster 0 scans the music folder and builds the Opus cache, and the others
+# pick up its index files. Extraction results are shared through STATE_DB.
+SHARDING = os.getenv("SHARDING", "0") == "1"
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 0))
+SHARD_CLUSTERS = int(os.getenv("SHARD_CLUSTERS", 1))
+CLUSTER_ID = int(os.getenv("CLUSTER_ID", 0))
+
+# Loudness normalization: the integrated loudness of every local song and
+# cached remote track is measured once in the background (LOUDNESS_WORKERS
+# processes, 0 = one per CPU core) and saved in LOUDNESS_FILE. Tracks then
+# play with a fixed volume gain towards LOUDNESS_TARGET LUFS, at most
+# LOUDNESS_MAX_GAIN dB either way; the Opus cache has it applied when
+# transcoding. Gains under LOUDNESS_MIN_GAIN dB are skipped, so Opus sources
+# already close to the target are still passed through without re-encoding.
+LOUDNESS_ENABLED = os.getenv("LOUDNESS_ENABLED", "1") == "1"
+LOUDNESS_FILE = Path(os.getenv("LOUDNESS_FILE", PROJECT_DIR / "cache" / "loudness.json"))
+LOUDNESS_WORKERS = int(os.getenv("LOUDNESS_WORKERS", 2))
+LOUDNESS_TARGET = float(os.getenv("LOUDNESS_TARGET", -14))
+LOUDNESS_MAX_GAIN = float(os.getenv("LOUDNESS_MAX_GAIN", 12))
+LOUDNESS_MIN_GAIN = float(os.getenv("LOUDNESS_MIN_GAIN", 1))
+
+# Guilds starting the same track from the same position within
+# FANOUT_BUFFER_SECONDS of each other share one FFmpeg pipeline; its Opus
+# frames are buffered that long for listeners that started a little later.
+FANOUT_ENABLED = os.getenv("FANOUT_ENABLED", "1") == "1"
+FANOUT_BUFFER_SECONDS = int(os.getenv("FANOUT_BUFFER_SECONDS", 10))
+
+# Seconds of audio read ahead of the player on a background thread, so short
+# network stalls of a stream are not heard (0 = off). Underruns and stalls are
+# counted per guild (metrics endpoint and !stats).
+JITTER_BUFFER_SECONDS = float(os.getenv("JITTER_BUFFER_SECONDS", 2))
+
+# Soundboard clips: local songs listed in CLIP_CACHE_SONGS (song numbers,
+# e.g. "2,5"; #2 is the 🥷 button) and songs whose file is at most
+# CLIP_CACHE_MAX_FILE_SIZE bytes (0 = off) are kept in memory as Opus frames,
+# CLIP_CACHE_MAX_BYTES in total (least recently played dropped first), and
+# start without FFmpeg or disk reads. Clips are read from the Opus cache, or
+# from the song itself if it is Ogg Opus.
+CLIP_CACHE_ENABLED = os.getenv("CLIP_CACHE_ENABLED", "1") == "1"
+CLIP_CACHE_SONGS = {int(n) for n in os.getenv("CLIP_CACHE_SONGS", "2").split(",") if n.strip()}
+CLIP_CACHE_MAX_FILE_SIZE = int(os.getenv("CLIP_CACHE_MAX_FILE_SIZE", 0))
+CLIP_CACHE_MAX_BYTES = int(os.getenv("CLIP_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# /play autocomplete: suggestions come from the local library and titles of
+# tracks already resolved, plus (AUTOCOMPLETE_REMOTE) a flat YouTube search
+# once the query has AUTOCOMPLETE_MIN_CHARS characters. Each user searches at
+# most once per AUTOCOMPLETE_THROTTLE seconds, results are cached for
+# AUTOCOMPLETE_CACHE_TTL seconds, and a search still running after
+# AUTOCOMPLETE_TIMEOUT seconds is answered from the local results only.
+AUTOCOMPLETE_REMOTE = os.getenv("AUTOCOMPLETE_REMOTE", "1") == "1"
+AUTOCOMPLETE_MIN_CHARS = int(os.getenv("AUTOCOMPLETE_MIN_CHARS", 3))
+AUTOCOMPLETE_THROTTLE = float(os.getenv("AUTOCOMPLETE_THROTTLE", 1.0))
+AUTOCOMPLETE_CACHE_TTL = int(os.getenv("AUTOCOMPLETE_CACHE_TTL", 600))
+AUTOCOMPLETE_TIMEOUT = float(os.getenv("AUTOCOMPLETE_TIMEOUT", 2.0))
+
 if not BOT_TOKEN:
     raise ValueError("DISCORD_BOT_TOKEN environment variable is not set!")
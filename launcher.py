@@ -0,0 +1,127 @@
+"""Run the bot as several processes ("clusters"), each owning a slice of the shards.
+
+Every cluster is a separate Python process with its own event loop, GIL,
+voice connections and players. Clusters that exit are restarted.
+
+    SHARD_CLUSTERS=4 python launcher.py
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+import aiohttp
+
+from config import BOT_TOKEN, SHARD_COUNT, SHARD_CLUSTERS
+
+logger = logging.getLogger('discord_bot.launcher')
+
+GATEWAY_URL = 'https://discord.com/api/v10/gateway/bot'
+# Discord allows max_concurrency IDENTIFYs per 5 seconds
+IDENTIFY_INTERVAL = 5
+RESTART_DELAY = 10
+
+
+async def fetch_gateway():
+    """Return Discord's recommended shard count and the IDENTIFY concurrency."""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(GATEWAY_URL, headers={'Authorization': f'Bot {BOT_TOKEN}'}) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return data['shards'], data['session_start_limit']['max_concurrency']
+
+
+def split_shards(shard_count, clusters):
+    """Split shard IDs into contiguous, evenly sized slices."""
+    clusters = max(1, min(clusters, shard_count))
+    size, extra = divmod(shard_count, clusters)
+    slices, start = [], 0
+    for cluster_id in range(clusters):
+        end = start + size + (cluster_id < extra)
+        slices.append(list(range(start, end)))
+        start = end
+    return slices
+
+
+def run_cluster(shard_ids, shard_count):
+    import bot
+    try:
+        asyncio.run(bot.main(shard_ids, shard_count))
+    except KeyboardInterrupt:
+        pass
+
+
+class Cluster:
+    def __init__(self, cluster_id, shard_ids, shard_count):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.process = None
+        self.started_at = 0.0
+
+    def start(self):
+        # Spawned children read CLUSTER_ID from the environment when they import config
+        os.environ['CLUSTER_ID'] = str(self.cluster_id)
+        os.environ['SHARDING'] = '1'
+        context = multiprocessing.get_context('spawn')
+        self.process = context.Process(
+            target=run_cluster, args=(self.shard_ids, self.shard_count), name=f'cluster-{self.cluster_id}'
+        )
+        self.process.start()
+        self.started_at = time.monotonic()
+        logger.info(f'Cluster {self.cluster_id} started (pid {self.process.pid}, shards {self.shard_ids})')
+
+
+def main():
+    # Not at import time: spawned clusters import this module too, and configure their own logging
+    logging.basicConfig(level=logging.INFO, format='[launcher] %(levelname)s:%(name)s:%(message)s')
+    shard_count, max_concurrency = asyncio.run(fetch_gateway())
+    if SHARD_COUNT:
+        shard_count = SHARD_COUNT
+    clusters = [
+        Cluster(cluster_id, shard_ids, shard_count)
+        for cluster_id, shard_ids in enumerate(split_shards(shard_count, SHARD_CLUSTERS))
+    ]
+    logger.info(f'{shard_count} shard(s) in {len(clusters)} cluster(s)')
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Stagger start-up so clusters do not exceed the IDENTIFY rate limit together
+    for cluster in clusters:
+        if stopping:
+            break
+        cluster.start()
+        time.sleep(IDENTIFY_INTERVAL * -(-len(cluster.shard_ids) // max_concurrency))
+
+    while not stopping:
+        time.sleep(1)
+        for cluster in clusters:
+            if stopping or cluster.process is None or cluster.process.is_alive():
+                continue
+            if time.monotonic() - cluster.started_at < RESTART_DELAY:
+                continue
+            logger.warning(f'Cluster {cluster.cluster_id} exited with {cluster.process.exitcode}, restarting')
+            cluster.start()
+
+    logger.info('Stopping clusters')
+    for cluster in clusters:
+        if cluster.process is not None and cluster.process.is_alive():
+            cluster.process.terminate()  # SIGTERM: the bot saves its state and closes
+    for cluster in clusters:
+        if cluster.process is not None:
+            cluster.process.join(timeout=30)
+            if cluster.process.is_alive():
+                cluster.process.kill()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Support services used by the bot's cogs (caching, extraction, playback)."""
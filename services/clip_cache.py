@@ -0,0 +1,143 @@
+import logging
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+import discord
+
+from services.opus_cache import iter_opus_packets
+
+logger = logging.getLogger('discord_bot.clip_cache')
+
+
+class Clip:
+    """A track's Opus packets in one contiguous buffer, with the offset of each packet."""
+
+    __slots__ = ('source', 'mtime', 'size', 'data', 'offsets')
+
+    def __init__(self, source, mtime, size, data, offsets):
+        self.source = source  # file the packets were read from
+        self.mtime = mtime  # of the library file, to notice changes
+        self.size = size
+        self.data = data
+        self.offsets = offsets  # packet i is data[offsets[i]:offsets[i + 1]]
+
+    @classmethod
+    def from_file(cls, source, mtime, size):
+        data = bytearray()
+        offsets = array('I', [0])
+        with open(source, 'rb') as f:
+            for packet in iter_opus_packets(f):
+                data += packet
+                offsets.append(len(data))
+        return cls(str(source), mtime, size, bytes(data), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        return len(self.data) + len(self.offsets) * self.offsets.itemsize
+
+
+class ClipSource(discord.AudioSource):
+    """Plays a Clip from memory: no subprocess, no disk reads."""
+
+    def __init__(self, clip, skip_frames=0):
+        self._clip = clip
+        self._index = skip_frames
+
+    def read(self):
+        clip = self._clip
+        if self._index >= len(clip):
+            return b''
+        start, end = clip.offsets[self._index], clip.offsets[self._index + 1]
+        self._index += 1
+        return clip.data[start:end]
+
+    def is_opus(self):
+        return True
+
+
+class ClipCache:
+    """Local songs kept in memory as Opus packets, for instant soundboard-style playback.
+
+    Clips are keyed by library path and checked against the library file's
+    mtime and size and the Opus file they were read from. The total size is
+    capped at ``max_bytes``; the least recently played clips go first.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._clips = OrderedDict()  # library path -> Clip, least recently used first
+        self._lock = threading.Lock()  # clips are loaded on executor threads
+        self.size = 0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._clips)
+
+    def _current(self, entry, source):
+        clip = self._clips.get(entry.path)
+        if clip is None or (clip.mtime, clip.size, clip.source) != (entry.mtime, entry.size, str(source)):
+            return None
+        return clip
+
+    def contains(self, entry, source):
+        with self._lock:
+            return self._current(entry, source) is not None
+
+    def get(self, entry, source):
+        """Return the clip of a library entry read from ``source``, or None if missing or stale."""
+        with self._lock:
+            clip = self._current(entry, source)
+            if clip is None:
+                return None
+            self._clips.move_to_end(entry.path)
+            self.hits += 1
+            return clip
+
+    def fits(self, source):
+        """True if a file would fit in the free space without evicting anything."""
+        try:
+            return self.size + os.path.getsize(source) <= self.max_bytes
+        except OSError:
+            return False
+
+    def load(self, entry, source):
+        """Read an Ogg Opus file into memory (blocking), evicting older clips to make room."""
+        clip = Clip.from_file(source, entry.mtime, entry.size)
+        if clip.nbytes > self.max_bytes:
+            logger.warning(f'{entry.path} does not fit in the clip cache ({clip.nbytes} bytes)')
+            return None
+        with self._lock:
+            old = self._clips.pop(entry.path, None)
+            if old is not None:
+                self.size -= old.nbytes
+            self._clips[entry.path] = clip
+            self.size += clip.nbytes
+            self.loads += 1
+            while self.size > self.max_bytes:
+                _, evicted = self._clips.popitem(last=False)
+                self.size -= evicted.nbytes
+                self.evictions += 1
+        return clip
+
+    def prune(self, paths):
+        """Drop clips of songs no longer in the library."""
+        with self._lock:
+            for path in [path for path in self._clips if path not in paths]:
+                self.size -= self._clips.pop(path).nbytes
+
+    def stats(self):
+        return {
+            'clips': len(self._clips),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'loads': self.loads,
+            'evictions': self.evictions,
+        }
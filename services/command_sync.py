@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import discord
+
+logger = logging.getLogger('discord_bot.command_sync')
+
+
+def tree_hash(tree):
+    """Hash of the global command payloads, as they would be sent to Discord."""
+    payload = [command.to_dict(tree) for command in tree.get_commands()]
+    payload.sort(key=lambda command: (command.get('type', 1), command['name']))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class CommandSync:
+    """Syncs the slash command tree only where it changed since the last sync.
+
+    The hash of the tree last synced globally and to each guild is kept in
+    ``state_file``, so a restart or reconnect with unchanged commands makes
+    no API calls at all.
+
+    - ``mode='guild'``: commands are copied to each guild (instant updates);
+      only guilds whose stored hash differs are synced, ``concurrency`` at a
+      time. The copies are dropped after syncing, incoming interactions fall
+      back to the global commands.
+    - ``mode='global'``: one global sync when the hash changed, and guild
+      copies left over from guild mode are removed.
+
+    Global syncs (and clearing them) are only done when ``sync_global`` is
+    set, so that with several shard clusters only one of them does it.
+    """
+
+    def __init__(self, tree, state_file, mode='guild', concurrency=4, sync_global=True):
+        self.tree = tree
+        self.state_file = Path(state_file)
+        self.mode = mode
+        self.concurrency = concurrency
+        self.sync_global = sync_global
+        self.state = {'global': None, 'guilds': {}}
+
+    def load(self):
+        if not self.state_file.exists():
+            return
+        try:
+            self.state = json.loads(self.state_file.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f'Ignoring unreadable command sync state: {e}')
+
+    def save(self):
+        tmp = self.state_file.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.state))
+        os.replace(tmp, self.state_file)
+
+    def forget(self, guild_id):
+        """Drop a guild (e.g. the bot was removed), so it is synced again if it comes back."""
+        if self.state['guilds'].pop(str(guild_id), None) is not None:
+            self.save()
+
+    async def sync(self, guilds):
+        """Bring Discord's commands up to date for these guilds; returns the number of API syncs."""
+        digest = tree_hash(self.tree)
+        guilds = list(guilds)
+        syncs = 0
+
+        if self.mode == 'global':
+            if self.sync_global and self.state.get('global') != digest:
+                synced = await self.tree.sync()
+                self.state['global'] = digest
+                syncs += 1
+                logger.info(f'Synced {len(synced)} global slash command(s)')
+            # Remove per-guild copies left from guild mode, or every command would show twice
+            stale = [guild for guild in guilds if str(guild.id) in self.state['guilds']]
+            syncs += await self._for_each(stale, self._clear_guild)
+        else:
+            if self.sync_global and self.state.get('global') is not None:
+                await self._clear_global()
+                syncs += 1
+            changed = [guild for guild in guilds if self.state['guilds'].get(str(guild.id)) != digest]
+            syncs += await self._for_each(changed, lambda guild: self._sync_guild(guild, digest))
+            logger.info(f'Slash commands: {len(changed)} guild(s) to sync, {len(guilds) - len(changed)} unchanged')
+
+        if syncs:
+            self.save()
+        return syncs
+
+    async def _for_each(self, guilds, sync):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(guild):
+            async with semaphore:
+                try:
+                    await sync(guild)
+                    return 1
+                except discord.HTTPException as e:
+                    # Left unrecorded, so it is retried on the next start
+                    logger.warning(f'Failed to sync commands to {guild.id}: {e}')
+                    return 0
+
+        return sum(await asyncio.gather(*(run(guild) for guild in guilds)))
+
+    async def _sync_guild(self, guild, digest):
+        self.tree.copy_global_to(guild=guild)
+        try:
+            await self.tree.sync(guild=guild)
+        finally:
+            self.tree.clear_commands(guild=guild)
+        self.state['guilds'][str(guild.id)] = digest
+
+    async def _clear_guild(self, guild):
+        self.tree.clear_commands(guild=guild)
+        await self.tree.sync(guild=guild)
+        self.state['guilds'].pop(str(guild.id), None)
+
+    async def _clear_global(self):
+        """Remove commands synced globally in global mode, keeping them in the local tree."""
+        commands = self.tree.get_commands()
+        self.tree.clear_commands(guild=None)
+        try:
+            await self.tree.sync()
+        finally:
+            for command in commands:
+                self.tree.add_command(command)
+        self.state['global'] = None
+        logger.info('Removed global slash commands (guild mode)')
@@ -0,0 +1,204 @@
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+# Matches the 11 character video ID in the common YouTube URL shapes
+YOUTUBE_ID_RE = re.compile(
+    r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([\w-]{11})'
+)
+
+# Rough per-entry bookkeeping overhead (dict, entry object, index slots)
+ENTRY_OVERHEAD = 512
+
+
+def normalize_query(query):
+    """Return a cache key for a query: the video ID for YouTube URLs, folded text otherwise."""
+    query = query.strip()
+    match = YOUTUBE_ID_RE.search(query)
+    if match:
+        return f'id:{match.group(1)}'
+    if query.startswith(('http://', 'https://')):
+        return f'url:{query}'
+    return 'q:' + ' '.join(query.lower().split())
+
+
+def parse_expiry(url):
+    """Return the unix timestamp a googlevideo stream URL expires at, or None."""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    values = parse_qs(parsed.query).get('expire')
+    if values and values[0].isdigit():
+        return int(values[0])
+    # Some manifests carry the parameters as path segments instead
+    match = re.search(r'/expire/(\d+)', parsed.path)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+class CacheEntry:
+    """A cached extraction result: track metadata plus its (expiring) stream URL."""
+
+    __slots__ = ('info', 'expires_at', 'size')
+
+    def __init__(self, info, expires_at):
+        self.info = info
+        self.expires_at = expires_at
+        self.size = ENTRY_OVERHEAD + sum(len(v) for v in info.values() if isinstance(v, str))
+
+    def is_fresh(self, margin):
+        return self.expires_at - margin > time.time()
+
+
+class ExtractionCache:
+    """LRU cache of resolved yt-dlp results bounded by an approximate memory cap.
+
+    Entries are stored by video ID; normalized queries (search text, URLs) map
+    onto those IDs so the same track found through different queries is only
+    cached once.
+    """
+
+    def __init__(self, max_bytes, default_ttl=3600, expiry_margin=300):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.expiry_margin = expiry_margin
+        self._entries = OrderedDict()  # video_id -> CacheEntry
+        self._queries = {}  # normalized query -> video_id
+        self._aliases = {}  # video_id -> set of normalized queries
+        self.dirty = set()  # video IDs changed since the last take_dirty()
+        self.size = 0
+        self.hits = 0
+        self.shared_hits = 0  # found in the state store, saved by another process
+        self.misses = 0
+        self.refreshes = 0  # found, but the stream URL had to be resolved again
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key_for(self, info):
+        return info.get('id') or info.get('webpage_url') or info['url']
+
+    def get(self, query):
+        """Look up a query; returns the CacheEntry (possibly expired) or None.
+
+        Lookups are not counted here: the caller may still find the query
+        elsewhere, and reports the outcome once with ``count``.
+        """
+        key = normalize_query(query)
+        video_id = key[3:] if key.startswith('id:') else self._queries.get(key)
+        entry = self._entries.get(video_id) if video_id else None
+        if entry is not None:
+            self._entries.move_to_end(video_id)
+        return entry
+
+    def count(self, entry, shared=False):
+        """Count one lookup by its outcome; ``shared`` if the entry came from the state store."""
+        if entry is None:
+            self.misses += 1
+        elif not entry.is_fresh(self.expiry_margin):
+            self.refreshes += 1
+        elif shared:
+            self.shared_hits += 1
+        else:
+            self.hits += 1
+
+    def put(self, query, info):
+        """Store an extraction result for a query and return its entry."""
+        video_id = self._key_for(info)
+        expires_at = parse_expiry(info['url']) or time.time() + self.default_ttl
+
+        old = self._entries.pop(video_id, None)
+        if old is not None:
+            self.size -= old.size
+
+        entry = CacheEntry(dict(info), expires_at)
+        self._entries[video_id] = entry
+        self.dirty.add(video_id)
+        self.size += entry.size
+
+        key = normalize_query(query)
+        if not key.startswith('id:') and self._queries.get(key) != video_id:
+            self._forget_query(key)
+            self._queries[key] = video_id
+            self._aliases.setdefault(video_id, set()).add(key)
+            self.size += len(key)
+
+        self._evict()
+        return entry
+
+    def refresh_url(self, entry, url):
+        """Swap in a newly resolved stream URL, keeping the cached metadata."""
+        delta = len(url) - len(entry.info.get('url') or '')
+        entry.info['url'] = url
+        entry.expires_at = parse_expiry(url) or time.time() + self.default_ttl
+        entry.size += delta
+        self.size += delta
+        self.dirty.add(self._key_for(entry.info))
+
+    def expire(self, query):
+        """Mark the stream URL cached for a query as stale, e.g. after it was refused (HTTP 403)."""
+        key = normalize_query(query)
+        video_id = key[3:] if key.startswith('id:') else self._queries.get(key)
+        entry = self._entries.get(video_id) if video_id else None
+        if entry is not None:
+            entry.expires_at = 0
+            self.dirty.add(video_id)
+
+    def restore(self, info, expires_at, queries):
+        """Re-insert an entry saved by a previous run (its URL may have expired)."""
+        video_id = self._key_for(info)
+        entry = CacheEntry(dict(info), expires_at)
+        old = self._entries.pop(video_id, None)
+        if old is not None:
+            self.size -= old.size
+        self._entries[video_id] = entry
+        self.size += entry.size
+        for key in queries:
+            if key not in self._queries:
+                self._queries[key] = video_id
+                self._aliases.setdefault(video_id, set()).add(key)
+                self.size += len(key)
+        self._evict()
+
+    def take_dirty(self):
+        """Return (video_id, info, expires_at, queries) for entries changed since the last call."""
+        rows = []
+        for video_id in self.dirty:
+            entry = self._entries.get(video_id)
+            if entry is not None:
+                rows.append((video_id, dict(entry.info), entry.expires_at, sorted(self._aliases.get(video_id, ()))))
+        self.dirty = set()
+        return rows
+
+    def _evict(self):
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            video_id, entry = self._entries.popitem(last=False)
+            self.size -= entry.size
+            self.evictions += 1
+            for key in self._aliases.pop(video_id, ()):
+                self.size -= len(key)
+                del self._queries[key]
+
+    def _forget_query(self, key):
+        video_id = self._queries.pop(key, None)
+        if video_id is not None:
+            self._aliases[video_id].discard(key)
+            self.size -= len(key)
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses + self.refreshes
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'evictions': self.evictions,
+            # Refreshes still run yt-dlp, so they are not hits
+            'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,402 @@
+import asyncio
+import importlib
+import multiprocessing
+import queue
+import signal
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+
+from services.extraction_cache import normalize_query
+
+# Results per flat search (autocomplete suggestions)
+SEARCH_RESULTS = 5
+
+
+def is_playlist_url(query):
+    """True for playlist links; watch links that also carry list= play just the video."""
+    if not query.startswith(('http://', 'https://')):
+        return False
+    parsed = urlparse(query)
+    params = parse_qs(parsed.query)
+    return 'list' in params and (parsed.path.rstrip('/') == '/playlist' or 'v' not in params)
+
+
+def extract_track(ydl, query):
+    """Resolve a URL or search query to the small track dict the cog works with."""
+    # Check if it's a URL or search query
+    if not query.startswith(('http://', 'https://')):
+        # Plain text -> search YouTube for first result
+        query = f'ytsearch1:{query}'
+
+    info = ydl.extract_info(query, download=False)
+
+    # Handle search results (ytsearch returns entries)
+    if 'entries' in info:
+        if not info['entries']:
+            raise Exception('No results found')
+        info = info['entries'][0]
+
+    return {
+        'id': info.get('id'),
+        'url': info['url'],
+        'title': info.get('title', 'Unknown'),
+        'duration': info.get('duration', 0),
+        'thumbnail': info.get('thumbnail'),
+        'webpage_url': info.get('webpage_url', query),
+        'codec': info.get('acodec'),
+        'is_local': False,
+    }
+
+
+def _flat_entries(info):
+    """Track dicts for the entries of a flat extraction: titles and page URLs only."""
+    entries = []
+    for entry in info.get('entries') or []:
+        if not entry or not entry.get('id'):
+            continue
+        entries.append({
+            'id': entry['id'],
+            'url': None,  # resolved lazily, shortly before the track plays
+            'title': entry.get('title') or 'Unknown',
+            'duration': int(entry.get('duration') or 0),
+            'thumbnail': None,
+            'webpage_url': f'https://www.youtube.com/watch?v={entry["id"]}',
+            'codec': None,
+            'is_local': False,
+        })
+    return entries
+
+
+def extract_playlist(ydl, url):
+    """Flat-extract a playlist: titles and page URLs only, no stream resolution."""
+    info = ydl.extract_info(url, download=False)
+    return {'title': info.get('title') or 'Playlist', 'entries': _flat_entries(info)}
+
+
+def search_tracks(ydl, query):
+    """Flat YouTube search for the top few results, for search-as-you-type suggestions."""
+    info = ydl.extract_info(f'ytsearch{SEARCH_RESULTS}:{query}', download=False)
+    return {'title': query, 'entries': _flat_entries(info)}
+
+
+# Job kind -> function turning (ydl, query) into the small result dict
+EXTRACTORS = {
+    'track': extract_track,
+    'playlist': extract_playlist,
+    'search': search_tracks,
+}
+
+
+def options_by_kind(ydl_options, playlist_limit):
+    """YoutubeDL options for each job kind."""
+    playlist_options = dict(ydl_options)
+    playlist_options.update({
+        'noplaylist': False,
+        'extract_flat': 'in_playlist',
+        'playlistend': playlist_limit,
+    })
+    search_options = dict(ydl_options)
+    search_options['extract_flat'] = 'in_playlist'
+    return {'track': ydl_options, 'playlist': playlist_options, 'search': search_options}
+
+
+class ThreadBackend:
+    """Runs extractions on a dedicated thread pool, one warm YoutubeDL per thread."""
+
+    name = 'thread'
+
+    def __init__(self, options, workers):
+        self.options = options  # kind -> YoutubeDL options
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ytdl')
+        # Idle, already initialised YoutubeDL objects per job kind
+        self._instances = {kind: queue.SimpleQueue() for kind in options}
+
+    async def run(self, kind, query):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run, kind, query)
+
+    def preload(self):
+        """Import yt-dlp on a worker thread, off the start-up path but before the first query."""
+        self._executor.submit(importlib.import_module, 'yt_dlp')
+
+    def _run(self, kind, query):
+        import yt_dlp  # deferred: importing it takes longer than the rest of start-up
+
+        instances = self._instances[kind]
+        try:
+            ydl = instances.get_nowait()
+        except queue.Empty:
+            ydl = yt_dlp.YoutubeDL(self.options[kind])
+        try:
+            return EXTRACTORS[kind](ydl, query)
+        finally:
+            instances.put(ydl)
+
+    async def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for instances in self._instances.values():
+            while not instances.empty():
+                instances.get_nowait().close()
+
+
+def _process_main(conn, options):
+    """Entry point of an extraction worker process: serve queries until told to stop."""
+    import yt_dlp
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    instances = {}
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        kind, query = job
+        try:
+            if kind not in instances:
+                instances[kind] = yt_dlp.YoutubeDL(options[kind])
+            conn.send((True, EXTRACTORS[kind](instances[kind], query)))
+        except Exception as e:
+            conn.send((False, str(e)))
+
+
+class ExtractionProcess:
+    """A long-lived worker process holding its own YoutubeDL instances."""
+
+    def __init__(self, options):
+        self.options = options
+        self.process = None
+        self.conn = None
+        self.restarts = -1
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_process_main, args=(child_conn, self.options), name='ytdl-worker', daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.restarts += 1
+
+    def kill(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join(timeout=5)
+            self.conn.close()
+            self.process = self.conn = None
+
+    async def run(self, kind, query, timeout):
+        if self.process is None or not self.process.is_alive():
+            self.kill()
+            self.start()
+
+        loop = asyncio.get_running_loop()
+        reply = loop.create_future()
+        fd = self.conn.fileno()
+
+        def on_readable():
+            loop.remove_reader(fd)
+            try:
+                # Replies are the small track dict, so reading them here is cheap
+                reply.set_result(self.conn.recv())
+            except (EOFError, OSError) as e:
+                reply.set_exception(e)
+
+        self.conn.send((kind, query))
+        loop.add_reader(fd, on_readable)
+        try:
+            try:
+                ok, result = await asyncio.wait_for(reply, timeout)
+            finally:
+                loop.remove_reader(fd)
+        except asyncio.TimeoutError:
+            self.kill()
+            raise Exception(f'Extraction timed out after {timeout}s')
+        except (EOFError, OSError):
+            self.kill()
+            raise Exception('Extraction worker crashed')
+        except BaseException:
+            # Cancelled mid-job: the process may still answer later, start afresh
+            self.kill()
+            raise
+
+        if not ok:
+            raise Exception(result)
+        return result
+
+
+class ProcessBackend:
+    """Runs extractions in long-lived worker processes, away from the bot's GIL.
+
+    Only the query string and the small result dict cross the process
+    boundary. A job that exceeds ``timeout`` gets its worker killed, and
+    dead workers are restarted on their next job.
+    """
+
+    name = 'process'
+
+    def __init__(self, options, workers, timeout=30):
+        self.timeout = timeout
+        self._workers = [ExtractionProcess(options) for _ in range(workers)]
+        self._idle = asyncio.Queue()
+        for worker in self._workers:
+            self._idle.put_nowait(worker)
+
+    @property
+    def restarts(self):
+        return sum(max(worker.restarts, 0) for worker in self._workers)
+
+    async def run(self, kind, query):
+        worker = await self._idle.get()
+        try:
+            return await worker.run(kind, query, self.timeout)
+        finally:
+            self._idle.put_nowait(worker)
+
+    async def close(self):
+        for worker in self._workers:
+            if worker.conn is not None:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._join)
+
+    def _join(self):
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+            worker.kill()
+
+
+class ExtractionJob:
+    __slots__ = ('kind', 'query', 'key', 'future')
+
+    def __init__(self, kind, query, key, future):
+        self.kind = kind
+        self.query = query
+        self.key = key
+        self.future = future
+
+
+class ExtractionService:
+    """Runs yt-dlp extractions on a bounded pool of warm YoutubeDL instances.
+
+    - At most ``workers`` extractions run at once, either on a dedicated
+      thread pool (instead of the event loop's shared default executor) or in
+      worker processes (``backend='process'``).
+    - Identical queries already in flight share a single extraction.
+    - Pending jobs are queued per guild and served round-robin, so a guild
+      queueing many songs only ever holds one slot at a time.
+    """
+
+    def __init__(self, ydl_options, workers=4, backend='thread', timeout=30, playlist_limit=1000):
+        self.workers = workers
+        options = options_by_kind(ydl_options, playlist_limit)
+        if backend == 'process':
+            self.backend = ProcessBackend(options, workers, timeout)
+        else:
+            self.backend = ThreadBackend(options, workers)
+        self._inflight = {}  # normalized query -> Future
+        self._pending = OrderedDict()  # guild_id -> deque of ExtractionJob
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            if hasattr(self.backend, 'preload'):
+                self.backend.preload()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for jobs in self._pending.values():
+            for job in jobs:
+                job.future.cancel()
+        self._pending.clear()
+        await self.backend.close()
+
+    @property
+    def queued(self):
+        return sum(len(jobs) for jobs in self._pending.values())
+
+    async def extract(self, query, guild_id=None):
+        """Resolve a query to a track, sharing the work with any identical query in flight."""
+        return await self._submit('track', query, guild_id)
+
+    async def extract_playlist(self, url, guild_id=None):
+        """Flat-extract a playlist URL to its title and entries."""
+        return await self._submit('playlist', url, guild_id)
+
+    async def search(self, query, guild_id=None):
+        """Flat-search YouTube for a few results (titles and page URLs, no stream URLs)."""
+        return await self._submit('search', query, guild_id)
+
+    async def _submit(self, kind, query, guild_id):
+        key = f'{kind}:{normalize_query(query)}'
+        future = self._inflight.get(key)
+
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            # Mark the exception as retrieved even if every waiter went away
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._inflight[key] = future
+            self._pending.setdefault(guild_id, deque()).append(ExtractionJob(kind, query, key, future))
+            self._wakeup.set()
+
+        return await asyncio.shield(future)
+
+    async def _next_job(self):
+        while not self._pending:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+        # Round-robin: take one job from the oldest guild, then move it to the back
+        guild_id, jobs = self._pending.popitem(last=False)
+        job = jobs.popleft()
+        if jobs:
+            self._pending[guild_id] = jobs
+        return job
+
+    async def _worker(self):
+        while True:
+            job = await self._next_job()
+            try:
+                result = await self.backend.run(job.kind, job.query)
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self.completed += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self._inflight.pop(job.key, None)
+
+    def stats(self):
+        return {
+            'backend': self.backend.name,
+            'restarts': getattr(self.backend, 'restarts', 0),
+            'workers': self.workers,
+            'running': len(self._inflight) - self.queued,
+            'queued': self.queued,
+            'completed': self.completed,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+        }
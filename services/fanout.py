@@ -0,0 +1,180 @@
+import logging
+import threading
+
+import discord
+
+from services.playback import FRAMES_PER_SECOND
+
+logger = logging.getLogger('discord_bot.fanout')
+
+
+class SharedStream:
+    """One Opus source read once and fanned out to any number of listeners.
+
+    Frames go into a ring buffer of ``capacity`` preallocated slots. Reading
+    is pull-based: whichever listener is furthest ahead reads the next frame
+    from the source, the others pick it up from the ring at their own cursor.
+    The source is cleaned up when the last listener leaves.
+    """
+
+    def __init__(self, original, path, capacity, reopen, on_close):
+        self.original = original
+        self.path = path
+        self.capacity = capacity
+        self.reopen = reopen  # offset seconds -> (source, path), for listeners that fall behind
+        self._on_close = on_close
+        self._ring = [None] * capacity
+        self._produced = 0  # frames read from the source so far
+        self._ended = False
+        self._closed = False
+        self.listeners = 0
+        self._lock = threading.Lock()  # ring state
+        self._read_lock = threading.Lock()  # held while reading the source
+
+    def joinable(self):
+        """True while the first frame is still in the ring, so a new listener can start from it."""
+        with self._lock:
+            return not self._closed and self._produced <= self.capacity
+
+    def subscribe(self):
+        with self._lock:
+            self.listeners += 1
+        return FanoutSource(self)
+
+    def unsubscribe(self):
+        with self._lock:
+            self.listeners -= 1
+            if self.listeners > 0 or self._closed:
+                return
+            self._closed = True
+            self._ring = [None] * self.capacity
+        self.original.cleanup()
+        self._on_close(self)
+
+    def read(self, cursor):
+        """Return the frame at ``cursor`` (b'' at the end), or None if it has left the ring."""
+        while True:
+            with self._lock:
+                if cursor < self._produced:
+                    if cursor < self._produced - self.capacity:
+                        return None
+                    return self._ring[cursor % self.capacity]
+                if self._ended:
+                    return b''
+            with self._read_lock:
+                with self._lock:
+                    if cursor < self._produced or self._ended:
+                        continue  # another listener read it meanwhile
+                data = self.original.read()
+                with self._lock:
+                    if data:
+                        self._ring[self._produced % self.capacity] = data
+                        self._produced += 1
+                    else:
+                        self._ended = True
+
+
+class FanoutSource(discord.AudioSource):
+    """One listener of a SharedStream, reading it at its own cursor.
+
+    A listener that falls further behind than the ring holds (e.g. it was
+    paused) leaves the stream and continues on a pipeline of its own.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._cursor = 0
+        self._detached = None
+        self._done = False
+
+    @property
+    def _current_error(self):
+        source = self._detached or self._stream.original
+        return getattr(source, '_current_error', None)
+
+    @property
+    def _process(self):
+        if self._detached is not None:
+            return getattr(self._detached, '_process', None)
+        # Only report the shared FFmpeg process when it is ours alone
+        return getattr(self._stream.original, '_process', None) if self._stream.listeners == 1 else None
+
+    def read(self):
+        if self._detached is not None:
+            return self._detached.read()
+        data = self._stream.read(self._cursor)
+        if data is None:
+            logger.info(f'Listener fell {self._stream.capacity} frames behind, starting its own pipeline')
+            self._detached, _ = self._stream.reopen(self._cursor / FRAMES_PER_SECOND)
+            self._leave()
+            return self._detached.read()
+        if data:
+            self._cursor += 1
+        return data
+
+    def is_opus(self):
+        return True
+
+    def _leave(self):
+        if not self._done:
+            self._done = True
+            self._stream.unsubscribe()
+
+    def cleanup(self):
+        self._leave()
+        if self._detached is not None:
+            self._detached.cleanup()
+
+
+class FanoutHub:
+    """Shares one FFmpeg pipeline between every guild playing the same track from the same position.
+
+    A guild starting a track joins a pipeline with the same key (track,
+    start position, gain) whose first frame is still buffered; otherwise a
+    new pipeline is opened. PCM sources are not shared, since discord.py
+    encodes them per voice client anyway.
+    """
+
+    def __init__(self, buffer_frames):
+        self.buffer_frames = buffer_frames
+        self._streams = {}  # key -> SharedStream
+        self._lock = threading.Lock()
+        self.started = 0
+        self.joined = 0
+
+    def open(self, key, opener):
+        """Return ``(source, path, shared)`` for a track.
+
+        ``opener(offset)`` opens the track's source ``offset`` seconds after
+        the start position and returns ``(source, path)``; it is only called
+        when no pipeline can be joined.
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+        if stream is not None and stream.joinable():
+            self.joined += 1
+            return stream.subscribe(), stream.path, True
+
+        original, path = opener(0)
+        if not original.is_opus():
+            return original, path, False
+        stream = SharedStream(original, path, self.buffer_frames, opener, lambda closed: self._remove(key, closed))
+        with self._lock:
+            self._streams[key] = stream
+        self.started += 1
+        return stream.subscribe(), path, False
+
+    def _remove(self, key, stream):
+        with self._lock:
+            if self._streams.get(key) is stream:
+                del self._streams[key]
+
+    def stats(self):
+        with self._lock:
+            streams = list(self._streams.values())
+        return {
+            'pipelines': len(streams),
+            'listeners': sum(stream.listeners for stream in streams),
+            'started': self.started,
+            'joined': self.joined,
+        }
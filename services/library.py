@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+logger = logging.getLogger('discord_bot.library')
+
+
+class LibraryEntry:
+    """A song in the local library together with its probed metadata."""
+
+    __slots__ = ('number', 'path', 'mtime', 'size', 'duration', 'title', 'artist', 'codec', 'probed')
+
+    def __init__(self, number, path, mtime, size, duration=0, title=None, artist=None, codec=None, probed=False):
+        self.number = number
+        self.path = path  # relative to the library root, '/' separated
+        self.mtime = mtime
+        self.size = size
+        self.duration = duration
+        self.title = title
+        self.artist = artist
+        self.codec = codec
+        self.probed = probed
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ScanResult:
+    """Changes found by LibraryIndex.scan(), applied on the event loop with apply()."""
+
+    __slots__ = ('dirs', 'added', 'removed', 'changed')
+
+    def __init__(self):
+        self.dirs = {}  # relative dir -> (mtime_ns, subdirs, files)
+        self.added = []  # (path, mtime, size)
+        self.removed = []  # paths
+        self.changed = []  # (path, mtime, size)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+
+def probe_file(path):
+    """Read duration, tags and codec of an audio file with ffprobe."""
+    args = [
+        'ffprobe', '-v', 'quiet', '-print_format', 'json',
+        '-show_format', '-show_streams', '-select_streams', 'a:0', str(path),
+    ]
+    data = json.loads(subprocess.check_output(args, timeout=30) or b'{}')
+    fmt = data.get('format', {})
+    streams = data.get('streams') or [{}]
+    tags = {key.lower(): value for key, value in fmt.get('tags', {}).items()}
+    tags.update({key.lower(): value for key, value in streams[0].get('tags', {}).items() if key.lower() not in tags})
+    return {
+        'duration': int(float(fmt.get('duration') or 0)),
+        'title': tags.get('title'),
+        'artist': tags.get('artist'),
+        'codec': streams[0].get('codec_name'),
+    }
+
+
+def probe_files(paths, workers=4):
+    """Probe several files in parallel; failed probes yield an empty dict.
+
+    Raises FileNotFoundError if ffprobe itself is not installed.
+    """
+    def probe(path):
+        try:
+            return probe_file(path)
+        except (subprocess.SubprocessError, ValueError, OSError) as e:
+            if isinstance(e, FileNotFoundError) and e.filename == 'ffprobe':
+                raise
+            logger.warning(f'Could not probe {path}: {e}')
+            return {}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ffprobe') as pool:
+        return list(pool.map(probe, paths))
+
+
+class LibraryIndex:
+    """In-memory index of the music folder with stable song numbers.
+
+    The folder is scanned recursively once and then kept up to date by
+    incremental scans: a directory is only listed again when its mtime
+    changes, so finding added or removed files does not stat every file.
+    Numbers are handed out once and never reused, so adding or removing a
+    file does not renumber the rest of the library. The index (numbers and
+    probed metadata) is persisted to ``index_file`` between restarts.
+    """
+
+    def __init__(self, root, index_file=None, extensions=()):
+        self.root = Path(root)
+        self.index_file = Path(index_file) if index_file else None
+        self.extensions = {ext.lower() for ext in extensions}
+        self._entries = {}  # number -> LibraryEntry
+        self._by_path = {}  # relative path -> LibraryEntry
+        self._dirs = {}  # relative dir -> (mtime_ns, subdirs, files)
+        self._next_number = 1
+        self._index_mtime = None  # mtime_ns of the index file when last loaded or saved
+        self.dirty = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(sorted(self._entries.values(), key=lambda entry: entry.number))
+
+    @property
+    def max_number(self):
+        return self._next_number - 1
+
+    def get(self, number):
+        return self._entries.get(number)
+
+    def absolute_path(self, entry):
+        return self.root / entry.path
+
+    def load(self):
+        """Load numbers and metadata persisted by a previous run."""
+        if self.index_file is None or not self.index_file.exists():
+            return
+        try:
+            self._index_mtime = self.index_file.stat().st_mtime_ns
+            data = json.loads(self.index_file.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f'Ignoring unreadable library index {self.index_file}: {e}')
+            return
+        for item in data.get('entries', []):
+            entry = LibraryEntry(**item)
+            self._entries[entry.number] = entry
+            self._by_path[entry.path] = entry
+        self._next_number = max(data.get('next_number', 1), self.max_number + 1, len(self._entries) + 1)
+
+    def save(self):
+        if self.index_file is None or not self.dirty:
+            return
+        data = {
+            'next_number': self._next_number,
+            'entries': [entry.to_dict() for entry in self],
+        }
+        tmp = self.index_file.with_suffix('.tmp')
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, self.index_file)
+        self._index_mtime = self.index_file.stat().st_mtime_ns
+        self.dirty = False
+
+    def reload(self):
+        """Re-read the index if another process saved it since; returns True if it did.
+
+        Used by processes that share a library without scanning it themselves.
+        """
+        try:
+            mtime = self.index_file.stat().st_mtime_ns
+        except (AttributeError, OSError):
+            return False
+        if mtime == self._index_mtime:
+            return False
+        self._entries.clear()
+        self._by_path.clear()
+        self.load()
+        return True
+
+    def scan(self, deep=False):
+        """Walk the folder and return the changes since the last scan (blocking).
+
+        Unchanged directories reuse their cached listing. With ``deep`` every
+        known file is stat'ed too, which catches files rewritten in place.
+        A directory that cannot be read (missing root, I/O error on network
+        storage) keeps its known files and numbers until it can be read again.
+        """
+        result = ScanResult()
+        seen = set()
+        if self.root.exists():
+            self._scan_dir('', result, seen, deep)
+        else:
+            # Not mounted (or not created yet): keep what is known, quietly
+            self._keep_dir('', result, seen)
+        result.removed = [path for path in self._by_path if path not in seen]
+        return result
+
+    def _scan_dir(self, rel, result, seen, deep):
+        path = self.root / rel if rel else self.root
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except OSError as e:
+            logger.warning(f'Could not read {path}: {e}')
+            self._keep_dir(rel, result, seen)
+            return
+
+        cached = self._dirs.get(rel)
+        if cached is not None and cached[0] == mtime_ns:
+            _, subdirs, files = cached
+        else:
+            subdirs, files = [], []
+            try:
+                with os.scandir(path) as it:
+                    for item in it:
+                        child = f'{rel}/{item.name}' if rel else item.name
+                        if item.is_dir():
+                            subdirs.append(child)
+                        elif item.is_file() and os.path.splitext(item.name)[1].lower() in self.extensions:
+                            files.append(child)
+            except OSError as e:
+                logger.warning(f'Could not list {path}: {e}')
+                self._keep_dir(rel, result, seen)
+                return
+            subdirs.sort()
+            files.sort()
+        result.dirs[rel] = (mtime_ns, subdirs, files)
+
+        for file in files:
+            seen.add(file)
+            entry = self._by_path.get(file)
+            if entry is not None and not deep:
+                continue
+            try:
+                stat = (self.root / file).stat()
+            except FileNotFoundError:
+                seen.discard(file)
+                continue
+            except OSError as e:
+                logger.warning(f'Could not stat {file}: {e}')
+                continue
+            if entry is None:
+                result.added.append((file, stat.st_mtime, stat.st_size))
+            elif (entry.mtime, entry.size) != (stat.st_mtime, stat.st_size):
+                result.changed.append((file, stat.st_mtime, stat.st_size))
+
+        for subdir in subdirs:
+            self._scan_dir(subdir, result, seen, deep)
+
+    def _keep_dir(self, rel, result, seen):
+        """Carry over the cached listings and known files under a directory that could not be read."""
+        prefix = f'{rel}/' if rel else ''
+        for cached_rel, listing in self._dirs.items():
+            if cached_rel == rel or cached_rel.startswith(prefix):
+                result.dirs[cached_rel] = listing
+        seen.update(file for file in self._by_path if file.startswith(prefix))
+
+    def apply(self, result):
+        """Apply a ScanResult; new files get the next free numbers in path order."""
+        self._dirs = result.dirs
+        for path in result.removed:
+            entry = self._by_path.pop(path)
+            del self._entries[entry.number]
+        for path, mtime, size in sorted(result.added):
+            entry = LibraryEntry(self._next_number, path, mtime, size)
+            self._next_number += 1
+            self._entries[entry.number] = entry
+            self._by_path[path] = entry
+        for path, mtime, size in result.changed:
+            entry = self._by_path[path]
+            entry.mtime, entry.size, entry.probed = mtime, size, False
+        if result:
+            self.dirty = True
+            logger.info(
+                f'Library: +{len(result.added)} -{len(result.removed)} ~{len(result.changed)} '
+                f'({len(self)} songs)'
+            )
+
+    def unprobed(self):
+        return [entry for entry in self._entries.values() if not entry.probed]
+
+    def set_metadata(self, entry, metadata):
+        for key, value in metadata.items():
+            setattr(entry, key, value)
+        entry.probed = True
+        self.dirty = True
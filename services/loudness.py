@@ -0,0 +1,159 @@
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+logger = logging.getLogger('discord_bot.loudness')
+
+# Save the index after this many new measurements
+SAVE_EVERY = 20
+
+LOUDNORM_JSON_RE = re.compile(r'\{[^{}]*"input_i"[^{}]*\}')
+
+
+def measure_loudness(path):
+    """Return the integrated loudness of an audio file in LUFS (None for silence).
+
+    Runs in a worker process: FFmpeg decodes the whole file once through the
+    loudnorm filter in analysis mode, which prints its measurements as JSON.
+    """
+    args = [
+        'ffmpeg', '-nostdin', '-hide_banner', '-i', str(path),
+        '-vn', '-af', 'loudnorm=print_format=json', '-f', 'null', '-',
+    ]
+    result = subprocess.run(args, check=True, capture_output=True, text=True, timeout=600)
+    match = LOUDNORM_JSON_RE.search(result.stderr)
+    if match is None:
+        raise Exception(f'No loudness measurement for {path}')
+    lufs = float(json.loads(match.group(0))['input_i'])
+    return lufs if math.isfinite(lufs) else None
+
+
+class LoudnessAnalyzer:
+    """Measures the loudness of audio files once, in a process pool, and remembers it.
+
+    Measurements are saved in ``index_file`` under a track key (a library
+    path or a video ID) together with the file's mtime and size, so a changed
+    file is measured again. ``gain`` turns a measurement into the fixed gain
+    that brings the track to ``target`` LUFS, so playback only needs a cheap
+    volume filter instead of real-time loudness normalization.
+    """
+
+    def __init__(self, index_file, workers=None, target=-14.0, max_gain=12.0):
+        self.index_file = Path(index_file)
+        self.workers = workers or os.cpu_count() or 1
+        self.target = target
+        self.max_gain = max_gain
+        self._index = {}  # key -> {'mtime', 'size', 'lufs'}
+        self._pending = OrderedDict()  # key -> (path, mtime, size)
+        self._running = set()
+        self._failed = set()  # keys not to retry until the next start
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.version = 0  # bumped on every new measurement
+        self.analyzed = 0
+        self.failed = 0
+
+    def load(self):
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        if not self.index_file.exists():
+            return
+        try:
+            self._index = json.loads(self.index_file.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f'Ignoring unreadable loudness index: {e}')
+
+    def save(self):
+        tmp = self.index_file.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self._index))
+        os.replace(tmp, self.index_file)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.save()
+
+    @property
+    def queued(self):
+        return len(self._pending) + len(self._running)
+
+    def gain(self, key, mtime, size):
+        """Return the gain in dB (0.1 dB steps) for a track, or None if it is not measured yet."""
+        measured = self._index.get(key)
+        if measured is None or (measured['mtime'], measured['size']) != (mtime, size):
+            return 0.0 if key in self._failed else None
+        if measured['lufs'] is None:
+            return 0.0  # silent, leave it alone
+        gain = max(-self.max_gain, min(self.max_gain, self.target - measured['lufs']))
+        return round(gain, 1)
+
+    def enqueue(self, key, path, mtime, size):
+        """Queue a file for measuring unless it is measured, queued or being measured."""
+        if key in self._pending or key in self._running or self.gain(key, mtime, size) is not None:
+            return
+        self._pending[key] = (str(path), mtime, size)
+        self._wakeup.set()
+
+    def forget(self, keys):
+        for key in keys:
+            self._index.pop(key, None)
+            self._pending.pop(key, None)
+
+    def retain(self, keys):
+        """Drop measurements of tracks not in ``keys`` (removed songs, evicted downloads); returns how many."""
+        stale = [key for key in self._index if key not in keys]
+        self.forget(stale)
+        self._failed &= keys
+        return len(stale)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Worker processes only exist while there is something to measure
+            context = multiprocessing.get_context('spawn')
+            pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            try:
+                while self._pending:
+                    batch = [self._pending.popitem(last=False) for _ in range(min(len(self._pending), SAVE_EVERY))]
+                    self._running.update(key for key, _ in batch)
+                    results = await asyncio.gather(
+                        *(loop.run_in_executor(pool, measure_loudness, path) for _, (path, _, _) in batch),
+                        return_exceptions=True,
+                    )
+                    for (key, (path, mtime, size)), result in zip(batch, results):
+                        self._running.discard(key)
+                        if isinstance(result, Exception):
+                            self.failed += 1
+                            self._failed.add(key)
+                            logger.warning(f'Could not measure the loudness of {path}: {result}')
+                            continue
+                        self._index[key] = {'mtime': mtime, 'size': size, 'lufs': result}
+                        self.analyzed += 1
+                        self.version += 1
+                    await loop.run_in_executor(None, self.save)
+            finally:
+                self._running.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            'tracks': len(self._index),
+            'queued': self.queued,
+            'analyzed': self.analyzed,
+            'failed': self.failed,
+        }
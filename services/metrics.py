@@ -0,0 +1,214 @@
+import json
+import logging
+import time
+from bisect import bisect_left
+from collections import deque
+
+logger = logging.getLogger('discord_bot.metrics')
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}  # sorted label tuple -> value
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for labels, value in self._values.items():
+            lines.append(f'{self.name}{_format_labels(labels)} {value}')
+        return lines
+
+
+class Gauge:
+    """A value read from a callback at scrape time; it may return a number or {label value: number}."""
+
+    def __init__(self, name, help, read, label=None):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.label = label
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge']
+        value = self.read()
+        if isinstance(value, dict):
+            for label_value, number in value.items():
+                lines.append(f'{self.name}{_format_labels(((self.label, label_value),))} {number}')
+        else:
+            lines.append(f'{self.name} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series = {}  # sorted label tuple -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, series in self._series.items():
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                total += count
+                lines.append(f'{self.name}_bucket{_format_labels(labels + (("le", bound),))} {total}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {series[-1]}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {total}')
+        return lines
+
+
+class Trace:
+    """Timestamps of one request's stages, from command receipt to the first audio packet.
+
+    ``mark`` only records a timestamp, so it is safe to call from the audio
+    thread; ``finish`` turns the marks into stage durations on the event loop.
+    """
+
+    __slots__ = ('metrics', 'name', 'guild_id', 'receive', 'started_at', 'marks', 'finished')
+
+    def __init__(self, metrics, name, guild_id=None, received_at=None):
+        self.metrics = metrics
+        self.name = name
+        self.guild_id = guild_id
+        # Gateway delivery plus command parsing, from the unix time Discord created
+        # the message or interaction (clamped against clock skew)
+        self.receive = max(0.0, time.time() - received_at) if received_at is not None else None
+        self.started_at = time.perf_counter()
+        self.marks = []  # (stage, perf_counter)
+        self.finished = False
+
+    def mark(self, stage):
+        self.marks.append((stage, time.perf_counter()))
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.metrics.finish_trace(self)
+
+    def stages(self):
+        """Return [(stage, seconds)], each measured from the previous mark."""
+        stages = []
+        if self.receive is not None:
+            stages.append(('receive', self.receive))
+        previous = self.started_at
+        for stage, at in self.marks:
+            stages.append((stage, at - previous))
+            previous = at
+        return stages
+
+
+class Metrics:
+    """In-process counters, gauges and latency histograms in the Prometheus text format.
+
+    Requests taking longer than ``slow_trace_seconds`` (0 disables it) have
+    their per-stage trace logged and kept for the ``/traces`` endpoint.
+    """
+
+    def __init__(self, prefix='muslop', slow_trace_seconds=0, max_traces=50):
+        self.prefix = prefix
+        self.slow_trace_seconds = slow_trace_seconds
+        self.slow_traces = deque(maxlen=max_traces)
+        self._metrics = []
+        self.stage_seconds = self.histogram('stage_seconds', 'Time spent in each stage of a request')
+        self.request_seconds = self.histogram('request_seconds', 'Total time to handle a request')
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help):
+        return self._register(Counter(f'{self.prefix}_{name}', help))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(f'{self.prefix}_{name}', help, buckets))
+
+    def gauge(self, name, help, read, label=None):
+        return self._register(Gauge(f'{self.prefix}_{name}', help, read, label))
+
+    def trace(self, name, guild_id=None, received_at=None):
+        return Trace(self, name, guild_id, received_at)
+
+    def finish_trace(self, trace):
+        stages = trace.stages()
+        for stage, seconds in stages:
+            self.stage_seconds.observe(seconds, request=trace.name, stage=stage)
+        total = sum(seconds for _, seconds in stages)
+        self.request_seconds.observe(total, request=trace.name)
+        if self.slow_trace_seconds and total >= self.slow_trace_seconds:
+            dump = {
+                'request': trace.name,
+                'guild_id': trace.guild_id,
+                'total': round(total, 4),
+                'stages': {stage: round(seconds, 4) for stage, seconds in stages},
+            }
+            self.slow_traces.append(dump)
+            logger.warning(f'Slow request: {json.dumps(dump)}')
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serves ``/metrics`` (Prometheus text) and ``/traces`` (recent slow requests) over HTTP."""
+
+    def __init__(self, metrics, host='127.0.0.1', port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def start(self):
+        from aiohttp import web  # the server half of aiohttp is only needed once it runs
+
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        app.router.add_get('/traces', self.handle_traces)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f'Metrics endpoint listening on http://{self.host}:{self.port}/metrics')
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle_metrics(self, request):
+        from aiohttp import web
+
+        return web.Response(text=self.metrics.render(), content_type='text/plain', charset='utf-8')
+
+    async def handle_traces(self, request):
+        from aiohttp import web
+
+        return web.json_response(list(self.metrics.slow_traces))
@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import discord
+from discord.oggparse import OggStream
+
+logger = logging.getLogger('discord_bot.opus_cache')
+
+HASH_CHUNK = 1024 * 1024
+
+
+def iter_opus_packets(fp):
+    """Yield the audio packets of an Ogg Opus stream, skipping the header packets."""
+    for packet in OggStream(fp).iter_packets():
+        if packet.startswith((b'OpusHead', b'OpusTags')):
+            continue
+        yield packet
+
+
+def file_digest(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_name(content_hash, gain=0.0):
+    """File name of a cached transcode, with the volume gain (dB) applied to it, if any."""
+    return f'{content_hash}.opus' if not gain else f'{content_hash}{gain:+.1f}dB.opus'
+
+
+def transcode_file(src, cache_dir, bitrate=128, gain=0.0):
+    """Transcode one file to 48 kHz Ogg Opus in cache_dir; returns its content hash.
+
+    Runs in a worker process. Files with identical content share one output.
+    A non-zero ``gain`` (dB) is applied while encoding, for loudness normalization.
+    """
+    content_hash = file_digest(src)
+    dest = Path(cache_dir) / cache_name(content_hash, gain)
+    if dest.exists():
+        return content_hash
+
+    tmp = dest.with_suffix(f'.{os.getpid()}.tmp')
+    volume = ['-af', f'volume={gain:.1f}dB'] if gain else []
+    args = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', str(src),
+        '-vn', '-map_metadata', '-1', *volume,
+        '-c:a', 'libopus', '-b:a', f'{bitrate}k', '-ar', '48000', '-ac', '2',
+        '-frame_duration', '20', '-f', 'opus', str(tmp),
+    ]
+    try:
+        subprocess.run(args, check=True, capture_output=True, timeout=600)
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return content_hash
+
+
+class OggOpusSource(discord.AudioSource):
+    """Plays a pre-encoded Ogg Opus file by reading its packets directly, no FFmpeg.
+
+    ``skip_frames`` 20 ms packets are dropped on the first read, to start mid-track.
+    """
+
+    def __init__(self, path, skip_frames=0):
+        self._file = open(path, 'rb')
+        self._packets = iter_opus_packets(self._file)
+        self._skip = skip_frames
+
+    def read(self):
+        if self._skip:
+            for _ in zip(range(self._skip), self._packets):
+                pass
+            self._skip = 0
+        return next(self._packets, b'')
+
+    def is_opus(self):
+        return True
+
+    def cleanup(self):
+        self._file.close()
+
+
+class OpusCache:
+    """On-disk cache of the local library transcoded to Ogg Opus.
+
+    Cached files are named by the content hash of their source. The index
+    remembers the mtime and size each source had when it was transcoded, so a
+    changed file stops matching and is transcoded again on the next build.
+    The loudness normalization gain is applied while transcoding, and a file
+    whose measured gain changed is transcoded again too.
+    """
+
+    def __init__(self, cache_dir, workers=None, bitrate=128):
+        self.cache_dir = Path(cache_dir)
+        self.index_file = self.cache_dir / 'index.json'
+        self.workers = workers or os.cpu_count() or 1
+        self.bitrate = bitrate
+        self._index = {}  # library path -> {'mtime', 'size', 'hash', 'gain'}
+        self._index_mtime = None
+        self.transcoded = 0
+        self.failed = 0
+
+    def load(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if self.index_file.exists():
+            try:
+                self._index_mtime = self.index_file.stat().st_mtime_ns
+                self._index = json.loads(self.index_file.read_text())
+            except (OSError, ValueError) as e:
+                logger.warning(f'Ignoring unreadable Opus cache index: {e}')
+
+    def reload(self):
+        """Re-read the index if another process saved it since the last load."""
+        try:
+            mtime = self.index_file.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._index_mtime:
+            self.load()
+
+    def save(self):
+        tmp = self.index_file.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self._index))
+        os.replace(tmp, self.index_file)
+
+    def lookup(self, entry, gain=None):
+        """Return the cached Opus file for a library entry, or None if missing or stale.
+
+        With ``gain`` given, a file transcoded with a different gain is stale too.
+        """
+        cached = self._index.get(entry.path)
+        if cached is None or (cached['mtime'], cached['size']) != (entry.mtime, entry.size):
+            return None
+        if gain is not None and cached.get('gain', 0.0) != gain:
+            return None
+        path = self.cache_dir / cache_name(cached['hash'], cached.get('gain', 0.0))
+        return path if path.exists() else None
+
+    def pending(self, library, gain_for):
+        """Entries to transcode, with their gain; entries whose gain is not known yet wait."""
+        pending = []
+        for entry in library:
+            gain = gain_for(entry)
+            if gain is not None and self.lookup(entry, gain) is None:
+                pending.append((entry, gain))
+        return pending
+
+    async def build(self, library, gain_for=lambda entry: 0.0, save_every=50):
+        """Transcode every library entry that has no up-to-date cached file.
+
+        ``gain_for(entry)`` returns the volume gain in dB to apply, or None to
+        leave the entry for a later build.
+        """
+        loop = asyncio.get_running_loop()
+        pending = self.pending(library, gain_for)
+        if pending:
+            logger.info(f'Transcoding {len(pending)} local song(s) to the Opus cache')
+            context = multiprocessing.get_context('spawn')
+            pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+            async def transcode(entry, gain):
+                # Remember the source state the output was made from
+                mtime, size = entry.mtime, entry.size
+                content_hash = await loop.run_in_executor(
+                    pool, transcode_file, library.absolute_path(entry), self.cache_dir, self.bitrate, gain
+                )
+                return entry.path, {'mtime': mtime, 'size': size, 'hash': content_hash, 'gain': gain}
+
+            # Only a couple of jobs per worker are submitted at a time, so a
+            # cancelled build does not leave the whole library queued in the pool
+            jobs = iter(pending)
+            running = set()
+            done = 0
+            try:
+                while True:
+                    for entry, gain in jobs:
+                        running.add(asyncio.ensure_future(transcode(entry, gain)))
+                        if len(running) >= self.workers * 2:
+                            break
+                    if not running:
+                        break
+                    finished, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for job in finished:
+                        try:
+                            path, cached = job.result()
+                        except Exception as e:
+                            self.failed += 1
+                            logger.warning(f'Could not transcode a local song: {e}')
+                        else:
+                            self.transcoded += 1
+                            self._index[path] = cached
+                        done += 1
+                        if done % save_every == 0:
+                            await loop.run_in_executor(None, self.save)
+            finally:
+                for job in running:
+                    job.cancel()
+                # Never wait for the pool here: that would block the event loop
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        paths = {entry.path for entry in library}
+        await loop.run_in_executor(None, self.prune, paths)
+
+    def prune(self, paths):
+        """Forget removed sources and delete cache files nothing refers to any more."""
+        self._index = {path: cached for path, cached in self._index.items() if path in paths}
+        live = {cache_name(cached['hash'], cached.get('gain', 0.0)) for cached in self._index.values()}
+        for file in self.cache_dir.glob('*.opus'):
+            if file.name not in live:
+                file.unlink(missing_ok=True)
+        self.save()
+
+    def stats(self):
+        return {
+            'files': len(self._index),
+            'transcoded': self.transcoded,
+            'failed': self.failed,
+        }
+
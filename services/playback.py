@@ -0,0 +1,234 @@
+import threading
+import time
+from collections import deque
+
+import discord
+
+
+class PrewarmedSource(discord.AudioSource):
+    """Wraps an audio source so its first frames can be read ahead of playback.
+
+    ``prewarm`` runs in a worker thread while the previous track is still
+    playing: it starts the FFmpeg pipeline and buffers the first few seconds,
+    so the handoff only has to hand over frames that are already in memory.
+    """
+
+    def __init__(self, original, on_first_frame=None):
+        self.original = original
+        self.on_first_frame = on_first_frame
+        self._buffer = deque()
+        self._started = False
+        self._playing = False
+        self.frames_read = 0  # frames handed to the voice client so far
+        self.created_at = time.monotonic()
+        self.closed = False
+        self.ended = False  # the original source ran out (as opposed to being stopped)
+
+    @property
+    def _current_error(self):
+        # AudioPlayer reports FFmpeg failures through this attribute
+        return getattr(self.original, '_current_error', None)
+
+    def prewarm(self, frames):
+        """Read up to ``frames`` frames into memory (blocking)."""
+        while len(self._buffer) < frames:
+            data = self.original.read()
+            if not data:
+                break
+            self._buffer.append(data)
+
+    @property
+    def buffered(self):
+        return len(self._buffer)
+
+    def read(self):
+        if not self._playing:
+            # Handed to the player: from here on, stalls are heard
+            self._playing = True
+            start_playback = getattr(self.original, 'start_playback', None)
+            if start_playback is not None:
+                start_playback()
+        data = self._buffer.popleft() if self._buffer else self.original.read()
+        if data:
+            self.frames_read += 1
+        else:
+            self.ended = True
+        if not self._started:
+            self._started = True
+            if self.on_first_frame is not None:
+                self.on_first_frame(time.perf_counter())
+        return data
+
+    def is_opus(self):
+        return self.original.is_opus()
+
+    @property
+    def process(self):
+        """The FFmpeg subprocess behind this source, if any."""
+        return getattr(self.original, '_process', None)
+
+    def cleanup(self):
+        self.closed = True
+        self._buffer.clear()
+        self.original.cleanup()
+
+
+class BufferStats:
+    """Jitter buffer health for one guild, updated from its audio threads."""
+
+    __slots__ = ('underruns', 'stall_seconds', 'longest_stall', 'fill', 'depth')
+
+    def __init__(self):
+        self.underruns = 0  # reads that found the buffer empty mid-track
+        self.stall_seconds = 0.0  # total time the player waited for audio
+        self.longest_stall = 0.0
+        self.fill = 0  # frames buffered at the last read
+        self.depth = 0  # capacity of the current buffer in frames
+
+
+class JitterBuffer(discord.AudioSource):
+    """Reads a source ahead on a background thread, so short input stalls are not heard.
+
+    Up to ``depth`` frames are kept in a fixed ring of slots allocated up
+    front. When the ring runs dry mid-track (the input stalled for longer
+    than the buffer covers), ``read`` waits for the next frame and records
+    the underrun and its duration in ``stats``.
+
+    Reads before ``start_playback`` (prewarming a prefetched track) are not
+    underruns, and go to private stats so they do not touch the guild's
+    ``stats`` while the current track still uses them.
+    """
+
+    def __init__(self, original, depth, stats=None):
+        self.original = original
+        self.depth = depth
+        self._guild_stats = stats
+        self.stats = BufferStats()
+        self.stats.depth = depth
+        self._playing = False
+        self._slots = [None] * depth
+        self._head = 0
+        self._count = 0
+        self._ended = False
+        self._closed = False
+        self._started = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._fill, name='jitter-buffer', daemon=True)
+        self._thread.start()
+
+    @property
+    def _current_error(self):
+        return getattr(self.original, '_current_error', None)
+
+    @property
+    def _process(self):
+        return getattr(self.original, '_process', None)
+
+    @property
+    def buffered(self):
+        return self._count
+
+    def start_playback(self):
+        """Count underruns from now on, in the guild's stats."""
+        with self._cond:
+            self._playing = True
+            if self._guild_stats is not None:
+                self.stats = self._guild_stats
+                self.stats.depth = self.depth
+                self.stats.fill = self._count
+
+    def _fill(self):
+        while True:
+            with self._cond:
+                while self._count >= self.depth and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            try:
+                data = self.original.read()
+            except Exception:
+                data = b''  # the source was cleaned up under us
+            with self._cond:
+                if not data:
+                    self._ended = True
+                    self._cond.notify_all()
+                    return
+                self._slots[(self._head + self._count) % self.depth] = data
+                self._count += 1
+                self._cond.notify_all()
+
+    def read(self):
+        with self._cond:
+            if not self._count and not self._ended and not self._closed:
+                stalled_at = time.perf_counter()
+                while not self._count and not self._ended and not self._closed:
+                    self._cond.wait()
+                if self._playing and self._started and self._count:
+                    # Dry mid-track; waiting for the first frame is start-up, not an underrun
+                    stall = time.perf_counter() - stalled_at
+                    self.stats.underruns += 1
+                    self.stats.stall_seconds += stall
+                    self.stats.longest_stall = max(self.stats.longest_stall, stall)
+            if not self._count:
+                return b''
+            data = self._slots[self._head]
+            self._slots[self._head] = None
+            self._head = (self._head + 1) % self.depth
+            self._count -= 1
+            self._started = True
+            self.stats.fill = self._count
+            self._cond.notify_all()
+            return data
+
+    def is_opus(self):
+        return self.original.is_opus()
+
+    def cleanup(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.original.cleanup()
+
+
+# Audio frames are 20 ms long
+FRAMES_PER_SECOND = 50
+
+# How a track's audio reaches Discord
+PATH_OPUS_COPY = 'opus-copy'  # Opus packets remuxed by FFmpeg, no decode/encode at all
+PATH_OPUS_ENCODE = 'opus-encode'  # decoded and encoded to Opus inside FFmpeg
+PATH_PCM = 'pcm'  # FFmpeg decodes to PCM, discord.py encodes to Opus in-process
+PATH_OPUS_CACHE = 'opus-cache'  # pre-transcoded Ogg Opus read from disk, no FFmpeg
+PATH_SHARED = 'shared'  # frames of another guild's identical pipeline, no FFmpeg of its own
+PATH_CLIP = 'clip'  # Opus frames preloaded in memory, no FFmpeg and no disk reads
+
+PATH_LABELS = {
+    PATH_OPUS_COPY: 'Opus passthrough',
+    PATH_OPUS_ENCODE: 'Transcoded (FFmpeg)',
+    PATH_PCM: 'Transcoded (PCM)',
+    PATH_OPUS_CACHE: 'Opus cache',
+    PATH_SHARED: 'Shared pipeline',
+    PATH_CLIP: 'Memory clip',
+}
+
+
+def open_ffmpeg_source(url, codec=None, mode='passthrough', before_options=None, options=None, start_at=0, gain=0.0):
+    """Open an FFmpeg source, passing Opus audio through untouched whenever possible.
+
+    Returns ``(source, path)`` where path is one of the ``PATH_*`` constants.
+    With ``mode='pcm'`` the legacy FFmpegPCMAudio pipeline is always used.
+    ``start_at`` (seconds) seeks the input before decoding starts. A non-zero
+    ``gain`` (dB) adds a volume filter, which means Opus can not be passed
+    through.
+    """
+    if start_at:
+        before_options = f'-ss {start_at:.2f} {before_options or ""}'.strip()
+    if gain:
+        options = f'{options or ""} -af volume={gain:.1f}dB'.strip()
+    if mode == 'pcm':
+        source = discord.FFmpegPCMAudio(url, before_options=before_options, options=options)
+        return source, PATH_PCM
+    if codec == 'opus' and not gain:
+        source = discord.FFmpegOpusAudio(url, codec='copy', before_options=before_options, options=options)
+        return source, PATH_OPUS_COPY
+    source = discord.FFmpegOpusAudio(url, before_options=before_options, options=options)
+    return source, PATH_OPUS_ENCODE
@@ -0,0 +1,92 @@
+import heapq
+import re
+from collections import Counter, OrderedDict
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _grams(text, partial_last=False):
+    """Trigrams of each word, padded so that word prefixes match.
+
+    With ``partial_last`` the last word gets no end padding, so a query that
+    is still being typed ("never gon") matches longer words ("gonna").
+    """
+    words = WORD_RE.findall(text.casefold())
+    grams = set()
+    for i, word in enumerate(words):
+        padded = f'  {word}' if partial_last and i == len(words) - 1 else f'  {word} '
+        grams.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return grams
+
+
+class TitleIndex:
+    """Trigram index for search-as-you-type over track titles.
+
+    Each entry is indexed by the trigrams of its words (padded, so prefixes
+    match too) and ranked by the share of the query's trigrams it contains,
+    which also tolerates small typos. With ``max_entries`` the oldest entries
+    are dropped first.
+    """
+
+    def __init__(self, max_entries=None, min_score=0.5):
+        self.max_entries = max_entries
+        self.min_score = min_score
+        self._entries = OrderedDict()  # key -> (label, value, grams)
+        self._postings = {}  # trigram -> set of keys
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def label(self, key):
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def add(self, key, text, value, label=None):
+        """Index ``text``; searches matching it return ``(label, value)``."""
+        self.remove(key)
+        grams = _grams(text)
+        self._entries[key] = (label or text, value, grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(key)
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                self.remove(next(iter(self._entries)))
+
+    def remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for gram in entry[2]:
+            keys = self._postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self._postings[gram]
+
+    def keys(self):
+        return list(self._entries)
+
+    def search(self, query, limit=25):
+        """Return up to ``limit`` ``(label, value)`` pairs, best match first."""
+        grams = _grams(query, partial_last=True)
+        if not grams:
+            return []
+        scores = Counter()
+        for gram in grams:
+            scores.update(self._postings.get(gram, ()))
+        needed = self.min_score * len(grams)
+        ranked = heapq.nsmallest(
+            limit,
+            (
+                # More shared trigrams first, then the shorter (closer) title
+                (-score, len(self._entries[key][2]), key)
+                for key, score in scores.items() if score >= needed
+            ),
+        )
+        return [self._entries[key][:2] for _, _, key in ranked]
@@ -0,0 +1,191 @@
+import random
+from bisect import bisect_right
+
+
+class Song:
+    """A queued track. Slotted, since long playlists keep thousands of these alive."""
+
+    __slots__ = (
+        'id', 'url', 'title', 'duration', 'thumbnail', 'webpage_url', 'codec', 'is_local',
+        'number', 'cached_file', 'playback_path',
+    )
+
+    def __init__(self, title, url=None, *, id=None, duration=0, thumbnail=None, webpage_url=None,
+                 codec=None, is_local=False, number=None, cached_file=None, playback_path=None):
+        self.id = id
+        self.url = url
+        self.title = title
+        self.duration = int(duration or 0)
+        self.thumbnail = thumbnail
+        self.webpage_url = webpage_url
+        self.codec = codec
+        self.is_local = is_local
+        self.number = number  # local library number
+        self.cached_file = cached_file  # on-disk copy of a remote track
+        self.playback_path = playback_path  # how the last play reached Discord
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls.from_info(data)
+
+    @classmethod
+    def from_info(cls, info):
+        """Build a Song from an extraction result dict."""
+        fields = {name: info[name] for name in cls.__slots__ if name in info and name != 'title'}
+        return cls(info.get('title') or 'Unknown', **fields)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f'<Song {self.title!r}>'
+
+
+class SongQueue:
+    """Song queue stored as a list of small blocks.
+
+    Popping the head and indexed access, insert, remove and move only touch
+    one block of at most ``load`` songs plus a binary search over block
+    offsets, so they stay cheap on playlists with thousands of entries, and
+    a page of the queue can be sliced without copying the rest. The total
+    duration is kept up to date on every edit.
+    """
+
+    def __init__(self, songs=(), load=256):
+        self.load = load
+        self._blocks = []
+        self._offsets = []  # index of each block's first song, rebuilt lazily
+        self._dirty = False
+        self._len = 0
+        self.total_duration = 0
+        self.version = 0  # bumped on every edit, so snapshots can tell if anything changed
+        # Songs popped from the front so far: the sequence number of queue[0], as
+        # long as the queue was only appended to and popped from the front. Any
+        # other edit bumps ``layout``, and the saved queue has to be rewritten.
+        self.popped = 0
+        self.layout = 0
+        self.extend(songs)
+
+    def __len__(self):
+        return self._len
+
+    def __bool__(self):
+        return self._len > 0
+
+    def __iter__(self):
+        for block in self._blocks:
+            yield from block
+
+    def _locate(self, index):
+        """Map a queue index to (block number, index within block)."""
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError('queue index out of range')
+        if self._dirty:
+            self._offsets, total = [], 0
+            for block in self._blocks:
+                self._offsets.append(total)
+                total += len(block)
+            self._dirty = False
+        pos = bisect_right(self._offsets, index) - 1
+        return pos, index - self._offsets[pos]
+
+    def _split(self, pos):
+        block = self._blocks[pos]
+        if len(block) > 2 * self.load:
+            self._blocks[pos:pos + 1] = [block[:self.load], block[self.load:]]
+
+    def _added(self, song):
+        self.version += 1
+        self._len += 1
+        self.total_duration += song.duration
+        self._dirty = True
+
+    def _removed(self, pos, song):
+        self.version += 1
+        self._len -= 1
+        self.total_duration -= song.duration
+        blocks = self._blocks
+        if not blocks[pos]:
+            del blocks[pos]
+        elif pos + 1 < len(blocks) and len(blocks[pos]) + len(blocks[pos + 1]) <= self.load:
+            # Merge shrunken neighbours so the block count tracks the queue length
+            blocks[pos].extend(blocks.pop(pos + 1))
+        self._dirty = True
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self.slice(*index.indices(self._len)[:2]))
+        pos, offset = self._locate(index)
+        return self._blocks[pos][offset]
+
+    def slice(self, start, stop):
+        """Return songs[start:stop] by walking only the blocks involved."""
+        start, stop = max(start, 0), min(stop, self._len)
+        if start >= stop:
+            return []
+        pos, offset = self._locate(start)
+        result = []
+        while len(result) < stop - start:
+            block = self._blocks[pos]
+            result.extend(block[offset:offset + stop - start - len(result)])
+            pos, offset = pos + 1, 0
+        return result
+
+    def append(self, song):
+        if not self._blocks or len(self._blocks[-1]) >= self.load:
+            self._blocks.append([])
+        self._blocks[-1].append(song)
+        self._added(song)
+
+    def extend(self, songs):
+        for song in songs:
+            self.append(song)
+
+    def insert(self, index, song):
+        if not self._len or index >= self._len:
+            # Like list.insert: past the end (or into an empty queue) appends
+            return self.append(song)
+        pos, offset = self._locate(max(index, -self._len))
+        self._blocks[pos].insert(offset, song)
+        self._split(pos)
+        self._added(song)
+        self.layout += 1
+
+    def popleft(self):
+        if not self._len:
+            raise IndexError('pop from an empty queue')
+        song = self._blocks[0].pop(0)
+        self._removed(0, song)
+        self.popped += 1
+        return song
+
+    def pop(self, index=-1):
+        """Remove and return the song at index."""
+        pos, offset = self._locate(index)
+        song = self._blocks[pos].pop(offset)
+        self._removed(pos, song)
+        self.layout += 1
+        return song
+
+    def move(self, source, destination):
+        """Move the song at index source so it ends up at index destination."""
+        song = self.pop(source)
+        self.insert(destination, song)
+        return song
+
+    def shuffle(self):
+        songs = list(self)
+        random.shuffle(songs)
+        self.clear()
+        self.extend(songs)
+
+    def clear(self):
+        self._blocks.clear()
+        self._offsets.clear()
+        self._dirty = False
+        self._len = 0
+        self.total_duration = 0
+        self.version += 1
+        self.layout += 1
@@ -0,0 +1,166 @@
+import json
+import sqlite3
+import time
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS players (
+    guild_id INTEGER PRIMARY KEY,
+    voice_channel_id INTEGER,
+    text_channel_id INTEGER,
+    loop INTEGER NOT NULL DEFAULT 0,
+    current TEXT,
+    position REAL NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queue (
+    guild_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    song TEXT NOT NULL,
+    PRIMARY KEY (guild_id, seq)
+);
+CREATE TABLE IF NOT EXISTS extractions (
+    video_id TEXT PRIMARY KEY,
+    info TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    queries TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS extraction_queries (
+    query TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL
+);
+'''
+
+
+class StateStore:
+    """SQLite (WAL) store for player state and extraction metadata.
+
+    All methods are blocking and meant to run on one dedicated thread. Writes
+    are batched by the caller into a single transaction per flush. Several
+    bot processes may share one database, which is how cached extractions
+    reach the other shard clusters.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+
+    def open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def load_players(self):
+        """Return every saved player as a dict, with its queue as a list of song dicts."""
+        players = []
+        rows = self._conn.execute(
+            'SELECT guild_id, voice_channel_id, text_channel_id, loop, current, position FROM players'
+        ).fetchall()
+        for guild_id, voice_channel_id, text_channel_id, loop, current, position in rows:
+            queue = [
+                json.loads(song) for (song,) in self._conn.execute(
+                    'SELECT song FROM queue WHERE guild_id = ? ORDER BY seq', (guild_id,)
+                )
+            ]
+            players.append({
+                'guild_id': guild_id,
+                'voice_channel_id': voice_channel_id,
+                'text_channel_id': text_channel_id,
+                'loop': bool(loop),
+                'current': json.loads(current) if current else None,
+                'position': position,
+                'queue': queue,
+            })
+        return players
+
+    def load_extractions(self, limit):
+        """Return the most recently used (info, expires_at, queries) rows."""
+        rows = self._conn.execute(
+            'SELECT info, expires_at, queries FROM extractions ORDER BY updated_at DESC LIMIT ?', (limit,)
+        ).fetchall()
+        # Oldest first, so replaying them leaves the newest at the LRU's hot end
+        return [(json.loads(info), expires_at, json.loads(queries)) for info, expires_at, queries in reversed(rows)]
+
+    def get_extraction(self, key):
+        """Return (info, expires_at, queries) saved for a normalized query, or None."""
+        if key.startswith('id:'):
+            video_id = key[3:]
+        else:
+            row = self._conn.execute('SELECT video_id FROM extraction_queries WHERE query = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            video_id = row[0]
+        row = self._conn.execute(
+            'SELECT info, expires_at, queries FROM extractions WHERE video_id = ?', (video_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], json.loads(row[2])
+
+    def write(self, players=(), queues=(), queue_changes=(), positions=(), deleted=(), extractions=()):
+        """Apply one flush worth of changes in a single transaction.
+
+        - players: (guild_id, voice_channel_id, text_channel_id, loop, current, position) rows
+        - queues: (guild_id, first_seq, [song dict, ...]) rows, replacing the saved queue
+        - queue_changes: (guild_id, head_seq, [(seq, song dict), ...]) rows for queues that
+          were only popped from the front and appended to: rows before head_seq are
+          deleted and the appended songs inserted
+        - positions: (position, guild_id) pairs for players whose queue did not change
+        - deleted: guild IDs to forget
+        - extractions: (video_id, info, expires_at, queries) rows
+        """
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO players '
+                '(guild_id, voice_channel_id, text_channel_id, loop, current, position, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (guild_id, voice, text, int(loop), json.dumps(current) if current else None, position, now)
+                    for guild_id, voice, text, loop, current, position in players
+                ],
+            )
+            for guild_id, first_seq, songs in queues:
+                self._conn.execute('DELETE FROM queue WHERE guild_id = ?', (guild_id,))
+                self._conn.executemany(
+                    'INSERT INTO queue (guild_id, seq, song) VALUES (?, ?, ?)',
+                    [(guild_id, seq, json.dumps(song)) for seq, song in enumerate(songs, first_seq)],
+                )
+            for guild_id, head_seq, songs in queue_changes:
+                self._conn.execute('DELETE FROM queue WHERE guild_id = ? AND seq < ?', (guild_id, head_seq))
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO queue (guild_id, seq, song) VALUES (?, ?, ?)',
+                    [(guild_id, seq, json.dumps(song)) for seq, song in songs],
+                )
+            self._conn.executemany(
+                'UPDATE players SET position = ?, updated_at = ? WHERE guild_id = ?',
+                [(position, now, guild_id) for position, guild_id in positions],
+            )
+            for guild_id in deleted:
+                self._conn.execute('DELETE FROM players WHERE guild_id = ?', (guild_id,))
+                self._conn.execute('DELETE FROM queue WHERE guild_id = ?', (guild_id,))
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO extractions (video_id, info, expires_at, queries, updated_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [
+                    (video_id, json.dumps(info), expires_at, json.dumps(queries), now)
+                    for video_id, info, expires_at, queries in extractions
+                ],
+            )
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO extraction_queries (query, video_id) VALUES (?, ?)',
+                [(query, video_id) for video_id, _, _, queries in extractions for query in queries],
+            )
+
+    def prune_extractions(self, max_age):
+        with self._conn:
+            self._conn.execute('DELETE FROM extractions WHERE updated_at < ?', (time.time() - max_age,))
+            self._conn.execute(
+                'DELETE FROM extraction_queries WHERE video_id NOT IN (SELECT video_id FROM extractions)'
+            )
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+logger = logging.getLogger('discord_bot.track_cache')
+
+# Forget one-off plays once this many distinct tracks have been counted
+MAX_TRACKED_PLAYS = 50000
+
+
+def download_audio(url, cache_dir, ydl_options):
+    """Download a track's best audio into cache_dir; returns (path, codec)."""
+    import yt_dlp
+
+    options = dict(ydl_options)
+    options.update({
+        'outtmpl': str(Path(cache_dir) / '%(id)s.%(ext)s'),
+        'noplaylist': True,
+        'overwrites': True,
+    })
+    with yt_dlp.YoutubeDL(options) as ydl:
+        info = ydl.extract_info(url, download=True)
+        return ydl.prepare_filename(info), info.get('acodec')
+
+
+class TrackCache:
+    """Size-capped on-disk cache of popular remote tracks.
+
+    Plays are counted per video ID; once a track has been played
+    ``min_plays`` times its audio is downloaded, and later plays read the
+    file from disk instead of streaming it again. The least recently played
+    files are deleted when the cache grows past ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir, max_bytes, min_plays=3, ydl_options=None):
+        self.cache_dir = Path(cache_dir)
+        self.index_file = self.cache_dir / 'index.json'
+        self.max_bytes = max_bytes
+        self.min_plays = min_plays
+        self.ydl_options = ydl_options or {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='track-cache')
+        self._entries = OrderedDict()  # video_id -> {'file', 'size', 'codec', 'last_used'}, LRU first
+        self._plays = {}  # video_id -> play count
+        self._downloading = set()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.downloads = 0
+        self.evictions = 0
+
+    def load(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if not self.index_file.exists():
+            return
+        try:
+            data = json.loads(self.index_file.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f'Ignoring unreadable track cache index: {e}')
+            return
+        self._plays = data.get('plays', {})
+        entries = sorted(data.get('entries', {}).items(), key=lambda item: item[1]['last_used'])
+        for video_id, entry in entries:
+            if (self.cache_dir / entry['file']).exists():
+                self._entries[video_id] = entry
+                self.size += entry['size']
+
+    def save(self):
+        tmp = self.index_file.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'plays': self._plays, 'entries': self._entries}))
+        os.replace(tmp, self.index_file)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def lookup(self, video_id):
+        """Return (path, codec) of a cached track, or None."""
+        entry = self._entries.get(video_id) if video_id else None
+        if entry is None:
+            return None
+        path = self.cache_dir / entry['file']
+        if not path.exists():
+            self._drop(video_id)
+            return None
+        entry['last_used'] = time.time()
+        self._entries.move_to_end(video_id)
+        return path, entry['codec']
+
+    def record_play(self, video_id, hit=False):
+        """Count a play, served from the cache or not; returns True once the track should be downloaded.
+
+        Only new plays of a track count, not restarts of one already playing
+        (seeks, resumes, loop repeats), and lookups are not counted at all: a
+        track is looked up again whenever its prefetch is discarded.
+        """
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if not video_id:
+            return False
+        if len(self._plays) >= MAX_TRACKED_PLAYS:
+            self._plays = {key: count for key, count in self._plays.items() if count > 1}
+        self._plays[video_id] = self._plays.get(video_id, 0) + 1
+        return (
+            self._plays[video_id] >= self.min_plays
+            and video_id not in self._entries
+            and video_id not in self._downloading
+        )
+
+    async def download(self, video_id, url):
+        """Download a track into the cache, then evict down to the size cap."""
+        self._downloading.add(video_id)
+        loop = asyncio.get_running_loop()
+        try:
+            path, codec = await loop.run_in_executor(
+                self._executor, download_audio, url, self.cache_dir, self.ydl_options
+            )
+            path = Path(path)
+            entry = {'file': path.name, 'size': path.stat().st_size, 'codec': codec, 'last_used': time.time()}
+            old = self._entries.pop(video_id, None)
+            if old is not None:
+                self.size -= old['size']
+            self._entries[video_id] = entry
+            self.size += entry['size']
+            self.downloads += 1
+            logger.info(f'Cached {video_id} ({entry["size"] / 1024 / 1024:.1f} MiB)')
+            self._evict()
+            await loop.run_in_executor(None, self.save)
+        except Exception as e:
+            logger.warning(f'Could not cache {video_id}: {e}')
+        finally:
+            self._downloading.discard(video_id)
+
+    def video_ids(self):
+        return list(self._entries)
+
+    def _drop(self, video_id):
+        entry = self._entries.pop(video_id, None)
+        if entry is not None:
+            self.size -= entry['size']
+            (self.cache_dir / entry['file']).unlink(missing_ok=True)
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._entries:
+            video_id = next(iter(self._entries))
+            self._drop(video_id)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'files': len(self._entries),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'downloads': self.downloads,
+            'evictions': self.evictions,
+        }